@@ -1,20 +1,55 @@
 import time
 import os
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import uuid
 from urllib.parse import quote_plus
 from datetime import datetime, timedelta
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi import BackgroundTasks, FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy import create_engine, text, Column, Float, Integer, String
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from passlib.context import CryptContext
-from jose import jwt
+from tokens import TokenError, get_backend
+from signing_keys import signer_from_env
+from password_hashing import password_hasher, pwd_context, hash_batches, HasherBusy, HASH_RETRY_AFTER
+from metrics import MetricsMiddleware, metrics_response
+from sql_timing import SQLTimingMiddleware, instrument_engine
+from db_pool import pool_options, pool_stats, InstrumentedQueuePool
 
 # --- Configuration ---
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "un_secret_tres_fort_a_changer")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Durée de vie d'un jeton de rafraîchissement (renouvelée à chaque rotation)
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Un jeton consommé est gardé ce temps (secondes) pour détecter son rejeu, puis supprimé
+REFRESH_REUSE_WINDOW = int(os.getenv("REFRESH_REUSE_WINDOW", "86400"))
+# Purge des jetons de rafraîchissement consommés ou expirés, au plus une fois par intervalle
+REFRESH_PURGE_INTERVAL = int(os.getenv("REFRESH_PURGE_INTERVAL", "300"))
+# Bibliothèque JWT (voir tokens.py) : "jose" par défaut ou "pyjwt"
+token_backend = get_backend()
+# Algorithme et clé de signature (voir signing_keys.py) : HS256 par défaut, ES256 ou EdDSA
+token_signer = signer_from_env(SECRET_KEY, token_backend)
+ALGORITHM = token_signer.algorithm
+# Durée de mise en cache du JWKS par les clients (secondes)
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+# Clé exigée (en-tête X-Revocation-Key) pour lire GET /revocations ; flux fermé (503) si vide
+REVOCATION_FEED_KEY = os.getenv("REVOCATION_FEED_KEY")
+REVOCATION_PAGE_SIZE = 1000
+# Provisionnement en masse (POST /admin/users/bulk) : désactivé sans ADMIN_API_KEY
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+PROVISION_MAX_USERS = int(os.getenv("PROVISION_MAX_USERS", "10000"))
+PROVISION_BATCH_SIZE = int(os.getenv("PROVISION_BATCH_SIZE", "500"))
+# Un seul provisionnement à la fois : il occupe déjà PROVISION_WORKERS processus
+provision_lock = threading.Lock()
+# Préfixe des clés d'API : tasks-api les distingue ainsi des JWT
+API_KEY_PREFIX = "tk_"
 
 # --- Database Configuration ---
 DB_USER = os.getenv("DB_USER", "postgres")
@@ -36,7 +71,18 @@ engine = None
 SessionLocal = None
 
 app = FastAPI()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+app.add_middleware(SQLTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    # File de hachage pleine (voir password_hashing.py) : le client réessaie plus tard
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many password operations in progress, retry later"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
 
 # --- Modèles de Données (User) ---
 class UserInDB(Base):
@@ -45,12 +91,76 @@ class UserInDB(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
 
+class RevokedToken(Base):
+    """
+    Révocation publiée sur GET /revocations : un jeton (jti), ou tous les jetons d'un
+    utilisateur émis avant not_before. L'id croissant sert de curseur au flux ;
+    la ligne n'est plus publiée après expires_at (les jetons concernés ont expiré).
+    """
+    __tablename__ = "revoked_tokens"
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True, nullable=True)
+    username = Column(String, nullable=False, index=True)
+    # Secondes avec fraction, comme iat : un jeton émis dans la même seconde mais
+    # après la coupure (nouvelle connexion juste après /logout-all) reste valide
+    not_before = Column(Float, nullable=True)
+    expires_at = Column(Integer, nullable=False, index=True)
+
+# create_all ne modifie pas les colonnes d'une table déjà existante
+AUTH_MIGRATION_DDL = ["ALTER TABLE revoked_tokens ALTER COLUMN not_before TYPE DOUBLE PRECISION"]
+
+class RefreshToken(Base):
+    """
+    Jeton de rafraîchissement, stocké haché (SHA-256) : une fuite de la base ne permet
+    pas de le rejouer. Chaque utilisation le consomme (used_at) et en émet un nouveau
+    dans la même famille ; présenter un jeton déjà consommé révoque toute la famille
+    (le jeton a probablement été volé). Les lignes consommées depuis plus de
+    REFRESH_REUSE_WINDOW et les lignes expirées sont supprimées (purge_refresh_tokens).
+    """
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    username = Column(String, nullable=False, index=True)
+    family = Column(String(32), nullable=False, index=True)
+    expires_at = Column(Integer, nullable=False, index=True)
+    used_at = Column(Integer, nullable=True, index=True)
+
+class ApiKey(Base):
+    """
+    Clé d'API longue durée d'un client machine. Seul le condensat SHA-256 est stocké,
+    sous un index unique : tasks-api la valide par une simple recherche (voir
+    tasks-api/api_keys.py), sans bcrypt ni JWT.
+    """
+    __tablename__ = "api_keys"
+    id = Column(Integer, primary_key=True)
+    key_hash = Column(String(64), unique=True, nullable=False)
+    username = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    prefix = Column(String(16), nullable=False)
+    created_at = Column(Integer, nullable=False)
+    revoked_at = Column(Integer, nullable=True)
+
 class UserCreate(BaseModel):
     username: str
     password: str
 
     model_config = ConfigDict(from_attributes=True) # <-- pour Pydantic v2
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class ApiKeyCreate(BaseModel):
+    name: str
+
+class ApiKeyOut(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    created_at: int
+    revoked_at: int | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
 # --- Dépendance DB ---
 def get_db():
     if SessionLocal is None:
@@ -66,10 +176,10 @@ def get_db():
 
 # --- Fonctions d'Authentification ---
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -77,25 +187,191 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti : identifiant révocable individuellement ; iat : pour les révocations par utilisateur
+    # (iat avec fraction de seconde, NumericDate de la RFC 7519)
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
+    encoded_jwt = token_signer.sign(to_encode)
     return encoded_jwt
 
+def rehash_password(db: Session, user_id: int, old_hash: str, password: str):
+    """Refait un hachage obsolète (coût ≠ BCRYPT_ROUNDS), après l'envoi de la réponse du login."""
+    try:
+        new_hash = get_password_hash(password)
+    except HasherBusy:
+        return  # file pleine : ce sera fait à un prochain login
+    # La session de la requête a été fermée par get_db : elle repart sur une nouvelle connexion
+    try:
+        # Conditionnel : ne remplace pas un mot de passe changé entre-temps
+        db.query(UserInDB).filter(
+            UserInDB.id == user_id, UserInDB.hashed_password == old_hash
+        ).update({"hashed_password": new_hash}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+# INSERT ... ON CONFLICT est propre au dialecte (PostgreSQL en production, SQLite en test)
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def dialect_insert(db: Session, model):
+    return DIALECT_INSERTS[db.get_bind().dialect.name](model)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def token_response(db: Session, username: str, family: str | None = None):
+    """Jeton d'accès + nouveau jeton de rafraîchissement (seul son condensat est stocké)."""
+    access_token = create_access_token(
+        data={"sub": username}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(refresh_token),
+        username=username,
+        family=family or uuid.uuid4().hex,
+        expires_at=int(time.time()) + REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+    ))
+    db.commit()
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+    }
+
+def revoke_refresh_tokens(db: Session, *criteria):
+    db.query(RefreshToken).filter(RefreshToken.used_at.is_(None), *criteria).update(
+        {"used_at": int(time.time())}, synchronize_session=False
+    )
+
+_refresh_purge = {"at": 0.0}
+_refresh_purge_lock = threading.Lock()
+
+def purge_refresh_tokens(db: Session, now: int, force: bool = False) -> int:
+    """
+    Supprime les jetons expirés et ceux consommés depuis plus de REFRESH_REUSE_WINDOW :
+    passé ce délai, un rejeu est simplement refusé au lieu de couper la famille.
+    Hors force, au plus une purge par REFRESH_PURGE_INTERVAL et par processus.
+    """
+    with _refresh_purge_lock:
+        if not force and now - _refresh_purge["at"] < REFRESH_PURGE_INTERVAL:
+            return 0
+        _refresh_purge["at"] = now
+    deleted = db.query(RefreshToken).filter(
+        (RefreshToken.expires_at <= now) | (RefreshToken.used_at <= now - REFRESH_REUSE_WINDOW)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def get_verified_claims(token: str = Depends(oauth2_scheme)):
+    """Revendications d'un jeton à la signature valide, révoqué ou non (voir get_token_claims)."""
+    try:
+        claims = token_signer.verify(token)
+    except TokenError:
+        claims = None
+    if claims is None or claims.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+def get_token_claims(claims: dict = Depends(get_verified_claims), db: Session = Depends(get_db)):
+    """
+    Comme get_verified_claims, mais refuse un jeton révoqué par /logout (son jti) ou
+    par /logout-all (iat antérieur à la coupure de l'utilisateur) : un jeton volé
+    puis révoqué ne peut plus émettre de clé d'API ni agir sur le compte.
+    """
+    revoked = db.query(RevokedToken.id).filter(
+        RevokedToken.username == claims["sub"],
+        RevokedToken.not_before > claims.get("iat", 0),
+    ).first()
+    if revoked is None and claims.get("jti") is not None:
+        revoked = db.query(RevokedToken.id).filter(RevokedToken.jti == claims["jti"]).first()
+    if revoked is not None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+def require_admin(x_admin_key: str | None = Header(None)):
+    if not ADMIN_API_KEY or not hmac.compare_digest(x_admin_key or "", ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin key")
+
+def provision_stream(db: Session, users: list[UserCreate]):
+    """Crée les comptes par lots (hachage parallèle + INSERT multi-lignes) et produit un résultat NDJSON par compte."""
+    def result(username, status_):
+        return json.dumps({"username": username, "status": status_}) + "\n"
+
+    try:
+        # Amorce (voir provision_users) : à partir d'ici, fermer le générateur libère le verrou
+        yield ""
+        seen, unique = set(), []
+        for user in users:
+            if user.username in seen:
+                yield result(user.username, "duplicate")
+            else:
+                seen.add(user.username)
+                unique.append(user)
+        batches = [unique[i:i + PROVISION_BATCH_SIZE] for i in range(0, len(unique), PROVISION_BATCH_SIZE)]
+        hashed = hash_batches([user.password for user in batch] for batch in batches)
+        for batch, hashes in zip(batches, hashed):
+            stmt = (
+                dialect_insert(db, UserInDB)
+                .values([
+                    {"username": user.username, "hashed_password": hashed_password}
+                    for user, hashed_password in zip(batch, hashes)
+                ])
+                .on_conflict_do_nothing(index_elements=[UserInDB.username])
+                .returning(UserInDB.username)
+            )
+            created = set(db.execute(stmt).scalars())
+            db.commit()
+            for user in batch:
+                yield result(user.username, "created" if user.username in created else "exists")
+    finally:
+        db.close()
+        provision_lock.release()
+
 # --- Endpoints ---
 @app.post("/register", status_code=status.HTTP_201_CREATED)
 def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserInDB).filter(UserInDB.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
+    # Hachage d'abord : la session n'a pas encore emprunté de connexion au pool
     hashed_password = get_password_hash(user.password)
-    db_user = UserInDB(username=user.username, hashed_password=hashed_password)
-    db.add(db_user)
+    # Une seule requête, sans course entre deux inscriptions du même nom
+    stmt = (
+        dialect_insert(db, UserInDB)
+        .values(username=user.username, hashed_password=hashed_password)
+        .on_conflict_do_nothing(index_elements=[UserInDB.username])
+        .returning(UserInDB.username)
+    )
+    username = db.execute(stmt).scalar_one_or_none()
     db.commit()
-    db.refresh(db_user)
-    return {"username": db_user.username}
+    if username is None:
+        # La réponse indique toujours que le nom est pris : hacher d'abord ne change que
+        # l'usage du pool de connexions, pas ce que l'inscription révèle
+        raise HTTPException(status_code=400, detail="Username already registered")
+    return {"username": username}
+
+@app.post("/admin/users/bulk", dependencies=[Depends(require_admin)])
+def provision_users(users: list[UserCreate], db: Session = Depends(get_db)):
+    """Provisionnement en masse ; résultats diffusés en NDJSON au fil des lots."""
+    if len(users) > PROVISION_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"At most {PROVISION_MAX_USERS} users per request")
+    if not provision_lock.acquire(blocking=False):
+        raise HasherBusy()
+    stream = provision_stream(db, users)
+    next(stream)  # démarré : même jamais lu (client parti), sa fermeture libère le verrou
+    return StreamingResponse(stream, media_type="application/x-ndjson")
 
 @app.post("/login")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db),
+):
     user = db.query(UserInDB).filter(UserInDB.username == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -103,11 +379,148 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    if pwd_context.needs_update(user.hashed_password):
+        background_tasks.add_task(rehash_password, db, user.id, user.hashed_password, form_data.password)
+    return token_response(db, user.username)
+
+@app.post("/token/refresh")
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    """Échange un jeton de rafraîchissement contre un nouveau couple de jetons, sans bcrypt."""
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    now = int(time.time())
+    row = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(body.refresh_token)
+    ).first()
+    if row is None or row.expires_at <= now:
+        raise invalid
+    # Consommation conditionnelle : de deux requêtes avec le même jeton, une seule réussit
+    consumed = db.query(RefreshToken).filter(
+        RefreshToken.id == row.id, RefreshToken.used_at.is_(None)
+    ).update({"used_at": now}, synchronize_session=False)
+    if not consumed:
+        # Jeton rejoué : on coupe toute la famille, voleur et client légitime compris
+        revoke_refresh_tokens(db, RefreshToken.family == row.family)
+        db.commit()
+        raise invalid
+    response = token_response(db, row.username, family=row.family)
+    purge_refresh_tokens(db, now)
+    return response
+
+@app.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: RefreshRequest | None = None,
+    claims: dict = Depends(get_verified_claims),
+    db: Session = Depends(get_db),
+):
+    """
+    Révoque le jeton présenté et, s'il est fourni, le jeton de rafraîchissement de la session.
+    Idempotent : un jeton déjà révoqué est accepté ici (et seulement ici).
+    """
+    jti = claims.get("jti")
+    if jti is not None and db.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is None:
+        db.add(RevokedToken(jti=jti, username=claims["sub"], expires_at=int(claims["exp"])))
+    if body is not None:
+        revoke_refresh_tokens(
+            db,
+            RefreshToken.token_hash == hash_refresh_token(body.refresh_token),
+            RefreshToken.username == claims["sub"],
+        )
+    db.commit()
+
+@app.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_all(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    """
+    Révoque tous les accès de l'utilisateur émis jusqu'à maintenant (compte compromis) :
+    jetons d'accès, jetons de rafraîchissement et clés d'API.
+    """
+    not_before = time.time()
+    now = int(not_before)
+    db.add(RevokedToken(
+        username=claims["sub"], not_before=not_before, expires_at=now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    ))
+    revoke_refresh_tokens(db, RefreshToken.username == claims["sub"])
+    db.query(ApiKey).filter(ApiKey.username == claims["sub"], ApiKey.revoked_at.is_(None)).update(
+        {"revoked_at": now}, synchronize_session=False
+    )
+    db.commit()
+
+@app.post("/api-keys", status_code=status.HTTP_201_CREATED)
+def create_api_key(body: ApiKeyCreate, claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    """Émet une clé d'API ; la clé en clair n'est renvoyée qu'ici, jamais stockée."""
+    key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    api_key = ApiKey(
+        key_hash=hashlib.sha256(key.encode()).hexdigest(),
+        username=claims["sub"],
+        name=body.name,
+        prefix=key[:len(API_KEY_PREFIX) + 6],
+        created_at=int(time.time()),
+    )
+    db.add(api_key)
+    db.commit()
+    return {**ApiKeyOut.model_validate(api_key).model_dump(), "key": key}
+
+@app.get("/api-keys", response_model=list[ApiKeyOut])
+def list_api_keys(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    return db.query(ApiKey).filter(ApiKey.username == claims["sub"]).order_by(ApiKey.id).all()
+
+@app.delete("/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_api_key(key_id: int, claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    """Révoque une clé ; tasks-api la refuse au plus tard après API_KEY_CACHE_TTL."""
+    revoked = db.query(ApiKey).filter(
+        ApiKey.id == key_id, ApiKey.username == claims["sub"], ApiKey.revoked_at.is_(None)
+    ).update({"revoked_at": int(time.time())}, synchronize_session=False)
+    db.commit()
+    if not revoked:
+        raise HTTPException(status_code=404, detail="API key not found")
+
+@app.get("/revocations")
+def read_revocations(
+    since: int = Query(0, ge=0),
+    x_revocation_key: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Révocations non expirées d'id > since, par ordre d'id (lu par tasks-api). Le flux
+    n'est servi qu'avec la clé REVOCATION_FEED_KEY : il expose des jti et des noms
+    d'utilisateurs. `sub` n'est publié que pour les coupures (/logout-all).
+    """
+    if not REVOCATION_FEED_KEY:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Revocation feed disabled")
+    if not hmac.compare_digest(x_revocation_key or "", REVOCATION_FEED_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid revocation feed key")
+    rows = (
+        db.query(RevokedToken)
+        .filter(RevokedToken.id > since, RevokedToken.expires_at > int(time.time()))
+        .order_by(RevokedToken.id)
+        .limit(REVOCATION_PAGE_SIZE)
+        .all()
+    )
+    return {
+        "revocations": [
+            {"jti": row.jti, "exp": row.expires_at} if row.jti is not None
+            else {"sub": row.username, "not_before": row.not_before, "exp": row.expires_at}
+            for row in rows
+        ],
+        "cursor": rows[-1].id if rows else since,
+        "more": len(rows) == REVOCATION_PAGE_SIZE,
+    }
+
+@app.get("/.well-known/jwks.json")
+def jwks(response: Response):
+    """Clés publiques de vérification des jetons (vide en HS256)."""
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE}"
+    return token_signer.jwks()
+
+# --- Moteur de base de données ---
+def create_db_engine():
+    """Le pool est réglé par les variables DB_POOL_* (voir db_pool.py)."""
+    return instrument_engine(
+        create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_options())
     )
-    return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/init-db")
 def init_db():
@@ -122,7 +535,7 @@ def init_db():
         # ---------------------
 
         if engine is None:
-             engine = create_engine(DATABASE_URL)
+             engine = create_db_engine()
         Base.metadata.create_all(bind=engine)
         return {"status": "success", "message": "Tables created"}
     except Exception as e:
@@ -134,6 +547,18 @@ def health_check():
     """Health check endpoint for Kubernetes liveness and readiness probes."""
     return {"status": "healthy"}
 
+@app.get("/pool-stats")
+def read_pool_stats():
+    """Statistiques du pool de connexions (connexions utilisées, overflow, temps d'attente)."""
+    return pool_stats.snapshot(engine.pool if engine is not None else None)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Métriques au format Prometheus (requêtes, latences, pool de connexions)."""
+    return metrics_response()
+
+pool_stats.bind(lambda: engine.pool if engine is not None else None)
+
 @app.on_event("startup")
 def on_startup():
     global engine, SessionLocal
@@ -144,9 +569,18 @@ def on_startup():
     for i in range(max_retries):
         try:
             print(f"Connecting to database at {DATABASE_URL}...")
-            engine = create_engine(DATABASE_URL)
+            engine = create_db_engine()
             SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
             Base.metadata.create_all(bind=engine)
+            if engine.dialect.name == "postgresql":
+                with engine.begin() as conn:
+                    for ddl in AUTH_MIGRATION_DDL:
+                        conn.execute(text(ddl))
+            # create_all ne crée pas les nouveaux index sur une table déjà existante
+            for index in (*RevokedToken.__table__.indexes, *RefreshToken.__table__.indexes):
+                index.create(bind=engine, checkfirst=True)
+            with SessionLocal() as db:
+                purge_refresh_tokens(db, int(time.time()), force=True)
             print("Database connection successful.")
             return
         except Exception as e:
@@ -155,6 +589,10 @@ def on_startup():
     
     print("Could not connect to database. Application will start but DB endpoints will fail.")
 
+@app.on_event("shutdown")
+def on_shutdown():
+    password_hasher.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     print("Démarrage du serveur Uvicorn...")
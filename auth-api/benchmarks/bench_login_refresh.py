@@ -0,0 +1,79 @@
+"""
+Benchmark : renouvellement d'un jeton d'accès par /login (bcrypt) vs /token/refresh.
+
+    cd auth-api && python benchmarks/bench_login_refresh.py --iterations 50
+
+L'application tourne en processus, sur SQLite en mémoire (comme les tests) : le
+débit mesuré est celui du code d'auth-api, sans réseau ni PostgreSQL. Affiche pour
+chaque voie le débit (req/s) et le temps CPU par requête ; sur un pod limité à
+200m de CPU, le temps CPU par requête est le chiffre qui compte.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import app, get_db, Base  # noqa: E402
+
+USERNAME = "bench-user"
+PASSWORD = "bench-password"
+
+
+def make_client() -> TestClient:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.post("/register", json={"username": USERNAME, "password": PASSWORD}).raise_for_status()
+    return client
+
+
+def measure(label: str, iterations: int, request):
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        request()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    print(f"{label:<20} {iterations / wall:>10,.0f} req/s {cpu / iterations * 1e3:>10.2f} ms CPU / request")
+    return cpu / iterations
+
+
+def main(iterations: int):
+    client = make_client()
+    form = {"username": USERNAME, "password": PASSWORD}
+    tokens = client.post("/login", data=form).json()
+
+    def login():
+        client.post("/login", data=form).raise_for_status()
+
+    def refresh():
+        # Rotation : chaque réponse fournit le jeton à présenter la fois suivante
+        response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+        response.raise_for_status()
+        tokens.update(response.json())
+
+    login_cpu = measure("POST /login", iterations, login)
+    refresh_cpu = measure("POST /token/refresh", iterations, refresh)
+    print(f"refresh uses {login_cpu / refresh_cpu:.1f}x less CPU than login")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,116 @@
+"""
+Pool de connexions configurable et instrumenté.
+
+Les paramètres du pool SQLAlchemy sont lus dans l'environnement :
+
+    DB_POOL_SIZE       connexions gardées ouvertes (défaut 5)
+    DB_MAX_OVERFLOW    connexions supplémentaires temporaires (défaut 10)
+    DB_POOL_TIMEOUT    attente max d'une connexion libre, en secondes (défaut 30)
+    DB_POOL_RECYCLE    âge max d'une connexion, en secondes (défaut 1800, -1 = jamais)
+    DB_POOL_PRE_PING   vérifie la connexion avant usage (défaut true)
+
+Chaque worker ouvre au plus DB_POOL_SIZE + DB_MAX_OVERFLOW connexions : le
+max_connections de Postgres doit couvrir ce total × workers × réplicas (× services).
+"""
+import os
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import Counter, Gauge, Histogram
+
+# Bornes (en secondes) de l'histogramme du temps d'obtention d'une connexion
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_options() -> dict:
+    """Arguments de create_engine() / create_async_engine() pour le pool."""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+class PoolStats:
+    """Temps d'attente pour obtenir une connexion, timeouts et état du pool (aussi exposés sur /metrics)."""
+
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.wait = Histogram(
+            "db_pool_checkout_wait_seconds", "Time spent obtaining a connection from the pool.",
+            buckets=buckets,
+        )
+        self.timeouts = Counter("db_pool_checkout_timeouts_total", "Pool checkouts that timed out.")
+        self.checked_out = Gauge("db_pool_checked_out", "Connections currently checked out.")
+        self.overflow = Gauge("db_pool_overflow", "Overflow connections currently open.")
+
+    def reset(self):
+        self.wait.clear()
+        self.timeouts.clear()
+
+    def bind(self, get_pool):
+        """Les jauges lisent le pool courant (get_pool() peut renvoyer None) à chaque collecte."""
+        def read(attribute):
+            pool = get_pool()
+            return max(getattr(pool, attribute)(), 0) if isinstance(pool, QueuePool) else 0
+        self.checked_out.set_function(lambda: read("checkedout"))
+        self.overflow.set_function(lambda: read("overflow"))
+
+    def observe_wait(self, seconds: float):
+        self.wait.observe(seconds)
+
+    def observe_timeout(self):
+        self.timeouts.inc()
+
+    def snapshot(self, pool=None) -> dict:
+        buckets, total = self.wait.labels().cumulative()
+        stats = {
+            "checkouts": buckets[-1][1],
+            "timeouts": int(self.timeouts.labels().get()),
+            "wait_seconds_sum": round(total, 6),
+            "wait_seconds_buckets": [
+                {"le": "+Inf" if bound == float("inf") else bound, "count": count}
+                for bound, count in buckets
+            ],
+        }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class _InstrumentedPoolMixin:
+    """Mesure le temps passé dans _do_get (attente d'une connexion libre ou ouverture d'une nouvelle)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.observe_timeout()
+            raise
+        pool_stats.observe_wait(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
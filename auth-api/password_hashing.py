@@ -0,0 +1,245 @@
+"""
+Hachage des mots de passe (bcrypt) hors du processus qui sert les requêtes.
+
+bcrypt coûte des dizaines de millisecondes de CPU par appel : exécuté dans les threads
+de requêtes, une rafale de logins sature le pod et /health ne répond plus. Les appels
+passent donc par un pool de processus borné :
+
+- HASH_WORKERS processus (défaut 1 ; 0 = dans le thread appelant, sans pool), lancés
+  avec une priorité réduite (HASH_WORKER_NICE, défaut 10) pour que le processus
+  principal garde la main sur le CPU du pod ;
+- au plus HASH_MAX_PENDING appels en cours ou en attente (défaut 16). Au-delà,
+  HasherBusy est levée et l'API répond 503 avec Retry-After (HASH_RETRY_AFTER,
+  défaut 1 s) au lieu d'empiler des requêtes qui expireront de toute façon.
+
+Métriques : attente dans la file, durée de hachage par opération, appels en cours,
+refus.
+
+Le provisionnement en masse (hash_batches) utilise plusieurs processus, toujours à
+priorité réduite : PROVISION_WORKERS (défaut : les CPU réellement attribués au
+conteneur — quota cgroup et affinité, pas les cœurs du nœud — plafonnés à
+PROVISION_MAX_DEFAULT_WORKERS = 2). Chaque processus coûte ~40Mi : au-delà, régler
+PROVISION_WORKERS explicitement selon la limite mémoire du pod.
+
+Le coût bcrypt vient de BCRYPT_ROUNDS (défaut : celui de passlib, 12). Pour le choisir selon
+le matériel, lancer sur un nœud représentatif :
+
+    python password_hashing.py --target-ms 250
+
+qui mesure le temps de hachage pour chaque coût et affiche le plus élevé qui tient
+dans le budget. Les hachages existants à un autre coût sont refaits au login suivant
+(needs_update).
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+from metrics import Counter, Gauge, Histogram
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "1"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "16"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+HASH_WORKER_NICE = int(os.getenv("HASH_WORKER_NICE", "10"))
+PROVISION_MAX_DEFAULT_WORKERS = 2
+
+
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """CPU utilisables par ce processus : affinité, puis quota cgroup (v2, sinon v1), arrondi au supérieur."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # hors Linux
+        cpus = os.cpu_count() or 1
+    quota = period = None
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us")) as f:
+                quota = f.read().strip()
+            with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us")) as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    if quota not in (None, "max", "-1") and period:
+        cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    return cpus
+
+
+PROVISION_WORKERS = int(os.getenv("PROVISION_WORKERS", "0")) or min(available_cpus(), PROVISION_MAX_DEFAULT_WORKERS)
+
+QUEUE_WAIT = Histogram("password_hash_queue_wait_seconds", "Time a hashing call waited for a worker.")
+HASH_TIME = Histogram("password_hash_seconds", "Time spent hashing or verifying a password.", ("operation",))
+PENDING = Gauge("password_hash_pending", "Hashing calls running or waiting for a worker.")
+REJECTED = Counter("password_hash_rejected_total", "Hashing calls rejected because the queue was full.")
+
+# Coût bcrypt (défaut de passlib : 12). Un hachage à un autre coût est « à mettre à jour »
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", str(bcrypt.default_rounds)))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_desired_rounds=BCRYPT_ROUNDS,
+)
+
+
+class HasherBusy(Exception):
+    """File de hachage pleine : réessayer après HASH_RETRY_AFTER secondes."""
+
+
+def _lower_priority(niceness: int):
+    if niceness:
+        os.nice(niceness)
+
+
+def _timed(submitted_at: float, operation: str, *args):
+    """Exécuté dans le worker : résultat, attente dans la file et durée du calcul."""
+    started = time.time()
+    if operation == "hash":
+        result = pwd_context.hash(*args)
+    else:
+        result = pwd_context.verify(*args)
+    return result, started - submitted_at, time.time() - started
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING,
+                 niceness: int = HASH_WORKER_NICE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.niceness = niceness
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        PENDING.set_function(lambda: self._pending)
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                REJECTED.inc()
+                raise HasherBusy()
+            self._pending += 1
+            if self.workers > 0 and self._executor is None:
+                # spawn : pas de fork d'un processus qui a déjà des threads (pool SQL, serveur)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_lower_priority,
+                    initargs=(self.niceness,),
+                )
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, operation: str, *args):
+        executor = self._acquire()
+        try:
+            if executor is None:
+                result, waited, took = _timed(time.time(), operation, *args)
+            else:
+                result, waited, took = executor.submit(_timed, time.time(), operation, *args).result()
+        except BrokenProcessPool as e:
+            # Worker tué (OOM...) : le pool sera recréé au prochain appel
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise HasherBusy() from e
+        finally:
+            self._release()
+        QUEUE_WAIT.observe(max(waited, 0.0))
+        HASH_TIME.labels(operation).observe(took)
+        return result
+
+    def hash(self, password: str) -> str:
+        """Bloque le thread appelant (pas le CPU) jusqu'au résultat ; lève HasherBusy si la file est pleine."""
+        return self._run("hash", password)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run("verify", password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def hash_batches(batches, workers: int = PROVISION_WORKERS):
+    """
+    Hache chaque lot de mots de passe sur `workers` processus et produit les lots de
+    hachages dans l'ordre. Le lot suivant est soumis avant de rendre le précédent :
+    le hachage continue pendant que l'appelant écrit en base.
+    """
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_lower_priority,
+        initargs=(HASH_WORKER_NICE,),
+    )
+    try:
+        pending = None
+        for batch in batches:
+            submitted = executor.map(_hash_password, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            if pending is not None:
+                yield list(pending)
+            pending = submitted
+        if pending is not None:
+            yield list(pending)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def calibrate_rounds(target_seconds: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3):
+    """Coût bcrypt le plus élevé dont le hachage (médiane de `samples`) tient dans `target_seconds`."""
+    timings = {}
+    best = min_rounds
+    pwd_context.handler("bcrypt").using(rounds=4).hash("warm-up")  # chargement du backend bcrypt
+    for rounds in range(min_rounds, max_rounds + 1):
+        hasher = pwd_context.handler("bcrypt").using(rounds=rounds)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash("calibration-password")
+            durations.append(time.perf_counter() - start)
+        timings[rounds] = statistics.median(durations)
+        if timings[rounds] > target_seconds:
+            break
+        best = rounds
+    return best, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Choisit BCRYPT_ROUNDS pour un budget de latence par hachage.")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="budget par hachage, en millisecondes")
+    parser.add_argument("--min-rounds", type=int, default=10, help="plancher de sécurité (défaut 10)")
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    best, timings = calibrate_rounds(args.target_ms / 1000, args.min_rounds, args.max_rounds, args.samples)
+    for rounds, seconds in timings.items():
+        print(f"rounds={rounds:<3} {seconds * 1000:8.1f} ms")
+    if timings[args.min_rounds] > args.target_ms / 1000:
+        print(f"WARNING: even rounds={args.min_rounds} exceeds {args.target_ms:.0f} ms on this node.")
+    print(f"BCRYPT_ROUNDS={best}")
@@ -0,0 +1,64 @@
+"""
+Provisionnement de comptes en masse via POST /admin/users/bulk.
+
+    ADMIN_API_KEY=... python provision_users.py users.csv --url http://localhost:8001
+
+Le fichier est un CSV avec les colonnes username,password (en-tête obligatoire), ou
+un fichier NDJSON ({"username": ..., "password": ...} par ligne) si son extension
+est .jsonl / .ndjson ; "-" lit le CSV sur l'entrée standard. Les comptes sont envoyés
+par requêtes de --chunk comptes ; les résultats (created / exists / duplicate) sont
+écrits en NDJSON sur la sortie standard au fur et à mesure, le bilan sur stderr.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+
+def read_users(path: str):
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        return [{"username": row["username"], "password": row["password"]} for row in csv.DictReader(f)]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def provision(client: httpx.Client, users: list[dict], chunk: int, totals: Counter):
+    for start in range(0, len(users), chunk):
+        with client.stream("POST", "/admin/users/bulk", json=users[start:start + chunk]) as response:
+            if response.status_code != 200:
+                response.read()
+                raise SystemExit(f"HTTP {response.status_code}: {response.text}")
+            for line in response.iter_lines():
+                if line:
+                    totals[json.loads(line)["status"]] += 1
+                    print(line, flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="CSV username,password, NDJSON (.jsonl) ou - pour stdin")
+    parser.add_argument("--url", default=os.getenv("AUTH_API_URL", "http://localhost:8001"))
+    parser.add_argument("--chunk", type=int, default=5000, help="comptes par requête (≤ PROVISION_MAX_USERS)")
+    args = parser.parse_args()
+
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key:
+        raise SystemExit("ADMIN_API_KEY is not set")
+    users = read_users(args.file)
+    totals = Counter()
+    start = time.perf_counter()
+    with httpx.Client(base_url=args.url, headers={"X-Admin-Key": admin_key}, timeout=None) as client:
+        provision(client, users, args.chunk, totals)
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{count} {status_}" for status_, count in sorted(totals.items()))
+    print(f"{len(users)} users in {elapsed:.1f}s ({len(users) / elapsed:.0f}/s): {summary}", file=sys.stderr)
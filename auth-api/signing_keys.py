@@ -0,0 +1,140 @@
+"""
+Clés de signature des jetons d'accès et document JWKS publié par auth-api.
+
+JWT_ALGORITHM choisit l'algorithme :
+
+- HS256 (défaut) : secret partagé JWT_SECRET_KEY, rien n'est publié dans le JWKS.
+- ES256 ou EdDSA (Ed25519) : clé privée PEM dans JWT_PRIVATE_KEY (ou le fichier
+  JWT_PRIVATE_KEY_FILE). Seule la clé publique est publiée sur /.well-known/jwks.json,
+  tasks-api vérifie alors localement sans connaître aucun secret. Sans clé configurée,
+  une clé éphémère est générée au démarrage (développement uniquement : chaque
+  réplica aurait sa propre clé).
+
+Le `kid` de chaque clé est son empreinte RFC 7638. Pour une rotation, publier
+l'ancienne clé publique (PEM) dans JWT_PREVIOUS_PUBLIC_KEYS le temps que les jetons
+qu'elle a signés expirent.
+"""
+import base64
+import hashlib
+import json
+import os
+
+from tokens import TokenError
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "EdDSA")
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def generate_private_key(algorithm: str):
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported asymmetric algorithm {algorithm!r}")
+
+
+def private_key_pem(private_key) -> str:
+    from cryptography.hazmat.primitives import serialization
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def public_jwk(public_key) -> dict:
+    """JWK public (RFC 7517 / RFC 8037) avec son kid RFC 7638."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        jwk = {
+            "crv": "P-256", "kty": "EC",
+            "x": _b64url(numbers.x.to_bytes(32, "big")),
+            "y": _b64url(numbers.y.to_bytes(32, "big")),
+        }
+        algorithm = "ES256"
+    elif isinstance(public_key, ed25519.Ed25519PublicKey):
+        raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        jwk = {"crv": "Ed25519", "kty": "OKP", "x": _b64url(raw)}
+        algorithm = "EdDSA"
+    else:
+        raise ValueError(f"Unsupported public key type {type(public_key).__name__}")
+    # Empreinte RFC 7638 : membres requis, triés, sans espaces
+    thumbprint = hashlib.sha256(json.dumps(jwk, sort_keys=True, separators=(",", ":")).encode()).digest()
+    return {**jwk, "kid": _b64url(thumbprint), "alg": algorithm, "use": "sig"}
+
+
+def _load_pem_blocks(text: str) -> list[bytes]:
+    marker = "-----END PUBLIC KEY-----"
+    return [(block + marker).strip().encode() for block in text.split(marker) if block.strip()]
+
+
+class TokenSigner:
+    """Signe les jetons d'accès avec la clé courante et expose le JWKS correspondant."""
+
+    def __init__(self, algorithm: str, secret: str, backend, private_pem: str | None = None,
+                 previous_public_pems: str = ""):
+        self.algorithm = algorithm
+        self.backend = backend
+        self.kid = None
+        self._jwks = []
+        self._verifying_keys = {}
+        if algorithm not in backend.algorithms:
+            raise ValueError(f"JWT backend {backend.name!r} does not support {algorithm} (try JWT_BACKEND=pyjwt)")
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            self.key = self.verifying_key = secret
+            return
+
+        from cryptography.hazmat.primitives import serialization
+        if private_pem:
+            private_key = serialization.load_pem_private_key(private_pem.encode(), password=None)
+        else:
+            print(f"WARNING: no JWT_PRIVATE_KEY set, generating an ephemeral {algorithm} key.")
+            private_key = generate_private_key(algorithm)
+        self.key = private_key_pem(private_key)
+        self.verifying_key = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        current = public_jwk(private_key.public_key())
+        self.kid = current["kid"]
+        self._jwks = [current] + [
+            public_jwk(serialization.load_pem_public_key(pem)) for pem in _load_pem_blocks(previous_public_pems)
+        ]
+        # Vérification par kid sur exactement les clés publiées : un jeton signé par
+        # l'ancienne clé reste accepté par auth-api comme par tasks-api
+        try:
+            self._verifying_keys = {jwk["kid"]: (jwk["alg"], backend.key_from_jwk(jwk)) for jwk in self._jwks}
+        except TokenError as e:
+            raise ValueError(f"JWT backend {backend.name!r} cannot load a published key: {e}") from e
+
+    def sign(self, claims: dict) -> str:
+        headers = {"kid": self.kid} if self.kid else None
+        return self.backend.encode(claims, self.key, self.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        """Revendications d'un jeton signé par une clé du JWKS, choisie par son kid (lève TokenError sinon)."""
+        if self.kid is None:
+            return self.backend.decode(token, self.verifying_key, [self.algorithm])
+        kid = self.backend.get_unverified_header(token).get("kid", self.kid)
+        if kid not in self._verifying_keys:
+            raise TokenError(f"Unknown signing key {kid!r}")
+        algorithm, key = self._verifying_keys[kid]
+        return self.backend.decode(token, key, [algorithm])
+
+    def jwks(self) -> dict:
+        return {"keys": list(self._jwks)}
+
+
+def signer_from_env(secret: str, backend) -> TokenSigner:
+    private_pem = os.getenv("JWT_PRIVATE_KEY")
+    key_file = os.getenv("JWT_PRIVATE_KEY_FILE")
+    if not private_pem and key_file:
+        with open(key_file) as f:
+            private_pem = f.read()
+    return TokenSigner(
+        os.getenv("JWT_ALGORITHM", "HS256"), secret, backend,
+        private_pem=private_pem, previous_public_pems=os.getenv("JWT_PREVIOUS_PUBLIC_KEYS", ""),
+    )
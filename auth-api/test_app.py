@@ -73,6 +73,26 @@ def test_register_user_duplicate(test_client):
     assert response.status_code == 400
     assert response.json() == {"detail": "Username already registered"}
 
+def test_register_user_single_statement(test_client):
+    """Teste que l'inscription (réussie ou en conflit) tient en une seule requête SQL."""
+    from sql_timing import instrument_engine
+    instrument_engine(engine)
+    for expected_status in (201, 400):
+        response = test_client.post("/register", json={"username": "onestatement", "password": "password123"})
+        assert response.status_code == expected_status
+        assert 'desc="1 queries"' in response.headers["server-timing"]
+
+def test_register_duplicate_keeps_original_password(test_client):
+    """Teste qu'une inscription en conflit ne remplace pas le mot de passe existant."""
+    test_client.post("/register", json={"username": "keepuser", "password": "password123"})
+    test_client.post("/register", json={"username": "keepuser", "password": "password456"})
+    response = test_client.post(
+        "/login",
+        data={"username": "keepuser", "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 200
+
 def test_login_user(test_client):
     """Teste la connexion d'un utilisateur."""
     # Créer un utilisateur
@@ -110,3 +130,402 @@ def test_login_user_invalid_credentials(test_client):
         headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
     assert response.status_code == 401
+
+def test_pool_stats_endpoint(test_client):
+    """Teste l'exposition des statistiques du pool de connexions."""
+    response = test_client.get("/pool-stats")
+    assert response.status_code == 200
+    assert "wait_seconds_buckets" in response.json()
+
+def test_metrics_endpoint(test_client):
+    """Teste l'exposition des métriques au format Prometheus."""
+    test_client.get("/health")
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in response.text
+
+def test_login_token_verifiable_by_all_backends(test_client):
+    """Teste que le jeton émis au login est lisible par chaque backend JWT."""
+    from app import SECRET_KEY, ALGORITHM
+    from tokens import available_backends, get_backend
+    test_client.post("/register", json={"username": "backenduser", "password": "password123"})
+    response = test_client.post(
+        "/login",
+        data={"username": "backenduser", "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    token = response.json()["access_token"]
+    claims = [get_backend(name).decode(token, SECRET_KEY, [ALGORITHM]) for name in available_backends()]
+    assert all(c == claims[0] for c in claims)
+    assert claims[0]["sub"] == "backenduser"
+
+def test_jwks_empty_for_hs256(test_client):
+    """Teste que le JWKS est publié (vide en HS256) avec un en-tête de cache."""
+    response = test_client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.json() == {"keys": []}
+    assert "max-age=" in response.headers["cache-control"]
+
+@pytest.mark.parametrize("algorithm", ["ES256", "EdDSA"])
+def test_asymmetric_signer_verifiable_from_jwks(algorithm):
+    """Teste qu'un jeton asymétrique se vérifie avec la clé du JWKS désignée par son kid, ancienne clé comprise."""
+    import time
+    from cryptography.hazmat.primitives import serialization
+    from signing_keys import TokenSigner, generate_private_key
+    from tokens import get_backend
+    backend = get_backend("pyjwt")
+    previous = generate_private_key(algorithm).public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    signer = TokenSigner(algorithm, "unused", backend, previous_public_pems=previous)
+    token = signer.sign({"sub": "alice", "exp": int(time.time()) + 60})
+
+    keys = signer.jwks()["keys"]
+    assert len(keys) == 2 and keys[0]["kid"] == signer.kid != keys[1]["kid"]
+    assert all("d" not in jwk for jwk in keys)
+    kid = backend.get_unverified_header(token)["kid"]
+    jwk = next(jwk for jwk in keys if jwk["kid"] == kid)
+    verifiers = [backend] + ([get_backend("jose")] if algorithm == "ES256" else [])
+    for verifier in verifiers:
+        assert verifier.decode(token, verifier.key_from_jwk(jwk), [algorithm])["sub"] == "alice"
+
+def test_eddsa_requires_pyjwt_backend():
+    """Teste qu'EdDSA est refusé au démarrage avec le backend jose, qui ne l'implémente pas."""
+    from signing_keys import TokenSigner
+    from tokens import get_backend
+    with pytest.raises(ValueError):
+        TokenSigner("EdDSA", "unused", get_backend("jose"))
+
+def _login(test_client, username):
+    test_client.post("/register", json={"username": username, "password": "password123"})
+    response = test_client.post(
+        "/login",
+        data={"username": username, "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    return response.json()["access_token"]
+
+FEED_KEY = "feed-secret"
+
+@pytest.fixture
+def feed(test_client, monkeypatch):
+    """Lit GET /revocations avec la clé du flux."""
+    import app as auth_app
+    monkeypatch.setattr(auth_app, "REVOCATION_FEED_KEY", FEED_KEY)
+    def read(since: int = 0):
+        response = test_client.get("/revocations", params={"since": since}, headers={"X-Revocation-Key": FEED_KEY})
+        assert response.status_code == 200
+        return response.json()
+    return read
+
+def test_logout_publishes_revocation(test_client, feed):
+    """Teste que /logout publie le jti du jeton sur le flux des révocations, une seule fois."""
+    from app import token_signer
+    token = _login(test_client, "logoutuser")
+    claims = token_signer.verify(token)
+    assert claims["jti"] and claims["iat"]
+
+    cursor = feed()["cursor"]
+    for _ in range(2):
+        response = test_client.post("/logout", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 204
+    page = feed(cursor)
+    # Entrée par jti : pas de nom d'utilisateur publié
+    assert page["revocations"] == [{"jti": claims["jti"], "exp": claims["exp"]}]
+    assert page["cursor"] > cursor and page["more"] is False
+    assert feed(page["cursor"])["revocations"] == []
+
+def test_logout_all_publishes_user_cutoff(test_client, feed):
+    """Teste que /logout-all publie une coupure couvrant les jetons déjà émis."""
+    from app import token_signer
+    token = _login(test_client, "compromised")
+    response = test_client.post("/logout-all", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 204
+    entry = feed()["revocations"][-1]
+    assert entry["sub"] == "compromised" and "jti" not in entry
+    assert entry["not_before"] > token_signer.verify(token)["iat"]
+
+def test_login_right_after_logout_all(test_client):
+    """Teste qu'une connexion dans la même seconde que /logout-all donne un jeton valide."""
+    token = _login(test_client, "relogin")
+    response = test_client.post("/logout-all", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 204
+    fresh = _login(test_client, "relogin")
+    response = test_client.post("/api-keys", json={"name": "ci"}, headers={"Authorization": f"Bearer {fresh}"})
+    assert response.status_code == 201
+    response = test_client.post("/api-keys", json={"name": "ci"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_logout_all_accepts_token_from_previous_key(test_client, monkeypatch):
+    """Teste qu'après rotation, un jeton signé par l'ancienne clé publiée est encore accepté par /logout-all."""
+    import app as auth_app
+    from signing_keys import TokenSigner, generate_private_key, private_key_pem
+    from tokens import get_backend
+    backend = get_backend("pyjwt")
+    old_key = generate_private_key("ES256")
+    monkeypatch.setattr(auth_app, "token_signer", TokenSigner("ES256", "unused", backend, private_key_pem(old_key)))
+    token = _login(test_client, "rotated")
+
+    old_public = auth_app.token_signer.verifying_key
+    # Ancienne clé non publiée : kid inconnu
+    monkeypatch.setattr(auth_app, "token_signer", TokenSigner("ES256", "unused", backend))
+    response = test_client.post("/logout-all", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+    rotated = TokenSigner("ES256", "unused", backend, previous_public_pems=old_public)
+    monkeypatch.setattr(auth_app, "token_signer", rotated)
+    assert backend.get_unverified_header(token)["kid"] != rotated.kid
+    response = test_client.post("/logout-all", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 204
+
+def test_logout_requires_valid_token(test_client):
+    """Teste qu'un jeton invalide ne peut pas révoquer."""
+    response = test_client.post("/logout", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+
+def test_revocation_feed_key(test_client, monkeypatch):
+    """Teste que le flux des révocations exige la clé, et qu'il est fermé sans REVOCATION_FEED_KEY."""
+    import app as auth_app
+    monkeypatch.setattr(auth_app, "REVOCATION_FEED_KEY", None)
+    assert test_client.get("/revocations").status_code == 503
+    assert test_client.get("/revocations", headers={"X-Revocation-Key": ""}).status_code == 503
+    monkeypatch.setattr(auth_app, "REVOCATION_FEED_KEY", "feed-secret")
+    assert test_client.get("/revocations").status_code == 403
+    assert test_client.get("/revocations", headers={"X-Revocation-Key": "wrong"}).status_code == 403
+    response = test_client.get("/revocations", headers={"X-Revocation-Key": "feed-secret"})
+    assert response.status_code == 200
+
+def _login_tokens(test_client, username):
+    test_client.post("/register", json={"username": username, "password": "password123"})
+    return test_client.post(
+        "/login",
+        data={"username": username, "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()
+
+def test_refresh_token_rotation(test_client, db_session, monkeypatch):
+    """Teste que /token/refresh émet un nouveau couple de jetons sans vérifier le mot de passe."""
+    import app as auth_app
+    from app import RefreshToken, hash_refresh_token, token_signer
+    tokens = _login_tokens(test_client, "refreshuser")
+    assert tokens["expires_in"] == auth_app.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    # Seul le condensat est stocké
+    stored = db_session.query(RefreshToken).filter(RefreshToken.username == "refreshuser").one()
+    assert stored.token_hash == hash_refresh_token(tokens["refresh_token"]) != tokens["refresh_token"]
+
+    monkeypatch.setattr(auth_app, "verify_password", lambda *a: pytest.fail("bcrypt on refresh"))
+    response = test_client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    renewed = response.json()
+    assert renewed["refresh_token"] != tokens["refresh_token"]
+    assert token_signer.verify(renewed["access_token"])["sub"] == "refreshuser"
+
+def test_refresh_token_reuse_revokes_family(test_client):
+    """Teste qu'un jeton de rafraîchissement rejoué est refusé et invalide aussi son successeur."""
+    tokens = _login_tokens(test_client, "reuseuser")
+    renewed = test_client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    replay = test_client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == 401
+    successor = test_client.post("/token/refresh", json={"refresh_token": renewed["refresh_token"]})
+    assert successor.status_code == 401
+
+def test_refresh_token_rejected_after_logout(test_client):
+    """Teste que /logout et /logout-all invalident les jetons de rafraîchissement."""
+    tokens = _login_tokens(test_client, "refreshlogout")
+    other = test_client.post(
+        "/login",
+        data={"username": "refreshlogout", "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()
+    auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    assert test_client.post("/logout", json={"refresh_token": tokens["refresh_token"]}, headers=auth).status_code == 204
+    assert test_client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    # Le jeton révoqué par /logout ne peut plus agir : /logout-all passe par l'autre session
+    assert test_client.post("/logout-all", headers=auth).status_code == 401
+    other_auth = {"Authorization": f"Bearer {other['access_token']}"}
+    assert test_client.post("/logout-all", headers=other_auth).status_code == 204
+    assert test_client.post("/token/refresh", json={"refresh_token": other["refresh_token"]}).status_code == 401
+
+def test_refresh_tokens_purged(test_client, db_session, monkeypatch):
+    """Teste que /token/refresh supprime les jetons expirés et ceux consommés hors de la fenêtre de rejeu."""
+    import time
+    import app as auth_app
+    from app import RefreshToken, hash_refresh_token
+    monkeypatch.setattr(auth_app, "REFRESH_PURGE_INTERVAL", 0)
+    first = _login_tokens(test_client, "purgeuser")
+    second = test_client.post("/token/refresh", json={"refresh_token": first["refresh_token"]}).json()
+    rows = db_session.query(RefreshToken).filter(RefreshToken.username == "purgeuser")
+    # Consommé récemment : gardé pour détecter le rejeu
+    assert rows.count() == 2
+
+    old = int(time.time()) - auth_app.REFRESH_REUSE_WINDOW - 1
+    rows.filter(RefreshToken.token_hash == hash_refresh_token(first["refresh_token"])).update({"used_at": old})
+    db_session.add(RefreshToken(token_hash="0" * 64, username="purgeuser", family="expired", expires_at=old))
+    db_session.commit()
+    third = test_client.post("/token/refresh", json={"refresh_token": second["refresh_token"]}).json()
+    assert {row.token_hash for row in rows} == {
+        hash_refresh_token(second["refresh_token"]), hash_refresh_token(third["refresh_token"])
+    }
+    # Hors de la fenêtre, le rejeu est refusé sans couper la famille
+    replay = test_client.post("/token/refresh", json={"refresh_token": first["refresh_token"]})
+    assert replay.status_code == 401
+    assert test_client.post("/token/refresh", json={"refresh_token": third["refresh_token"]}).status_code == 200
+
+def test_refresh_token_unknown(test_client):
+    """Teste qu'un jeton de rafraîchissement inconnu est refusé."""
+    response = test_client.post("/token/refresh", json={"refresh_token": "not-a-refresh-token"})
+    assert response.status_code == 401
+
+def test_password_hashing_queue_full_returns_503(test_client, monkeypatch):
+    """Teste qu'une file de hachage pleine donne 503 + Retry-After au lieu de bloquer."""
+    from password_hashing import password_hasher
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = test_client.post("/register", json={"username": "busyuser", "password": "password123"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_password_hashing_metrics(test_client):
+    """Teste que le hachage passe par le pool et expose attente et durée."""
+    test_client.post("/register", json={"username": "metricsuser", "password": "password123"})
+    text = test_client.get("/metrics").text
+    assert 'password_hash_seconds_count{operation="hash"}' in text
+    assert "password_hash_queue_wait_seconds_count" in text
+    assert "password_hash_pending 0" in text
+
+def test_password_hasher_inline():
+    """Teste le mode sans pool (HASH_WORKERS=0) : même résultat, même borne."""
+    from password_hashing import HasherBusy, PasswordHasher
+    hasher = PasswordHasher(workers=0, max_pending=1)
+    hashed = hasher.hash("secret")
+    assert hasher.verify("secret", hashed) and not hasher.verify("other", hashed)
+    hasher.max_pending = 0
+    with pytest.raises(HasherBusy):
+        hasher.hash("secret")
+
+def test_login_rehashes_outdated_password(test_client, db_session):
+    """Teste qu'un hachage à un coût obsolète est refait après un login réussi."""
+    from app import UserInDB
+    from password_hashing import pwd_context
+    old_hash = pwd_context.handler("bcrypt").using(rounds=4).hash("password123")
+    assert pwd_context.needs_update(old_hash)
+    db_session.add(UserInDB(username="legacyuser", hashed_password=old_hash))
+    db_session.commit()
+
+    response = test_client.post(
+        "/login",
+        data={"username": "legacyuser", "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 200
+    new_hash = db_session.query(UserInDB.hashed_password).filter(UserInDB.username == "legacyuser").scalar()
+    assert new_hash != old_hash and not pwd_context.needs_update(new_hash)
+    assert pwd_context.verify("password123", new_hash)
+
+def test_calibrate_rounds_respects_budget():
+    """Teste que la calibration retient le coût le plus élevé sous le budget, jamais sous le plancher."""
+    from password_hashing import calibrate_rounds
+    best, timings = calibrate_rounds(target_seconds=10.0, min_rounds=4, max_rounds=6, samples=1)
+    assert best == 6 and sorted(timings) == [4, 5, 6]
+    best, _ = calibrate_rounds(target_seconds=0.0, min_rounds=4, max_rounds=6, samples=1)
+    assert best == 4
+
+def test_available_cpus_follows_cgroup_quota(tmp_path, monkeypatch):
+    """Teste que le nombre de CPU suit le quota cgroup (v2 puis v1), pas les cœurs du nœud."""
+    import os
+    from password_hashing import available_cpus
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(32)), raising=False)
+    assert available_cpus(str(tmp_path)) == 32  # pas de quota
+    (tmp_path / "cpu.max").write_text("20000 100000\n")  # 200m
+    assert available_cpus(str(tmp_path)) == 1
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert available_cpus(str(tmp_path)) == 32
+    (tmp_path / "cpu.max").unlink()
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("250000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert available_cpus(str(tmp_path)) == 3
+
+def test_bulk_provision_streams_results(test_client, monkeypatch):
+    """Teste le provisionnement en masse : un résultat NDJSON par compte, doublons et existants signalés."""
+    import json
+    import app as auth_app
+    monkeypatch.setattr(auth_app, "ADMIN_API_KEY", "admin-secret")
+    monkeypatch.setattr(auth_app, "PROVISION_BATCH_SIZE", 2)
+    # Les workers (spawn) lisent BCRYPT_ROUNDS au démarrage : coût minimal pour le test
+    monkeypatch.setenv("BCRYPT_ROUNDS", "4")
+    test_client.post("/register", json={"username": "already", "password": "password123"})
+
+    users = [{"username": name, "password": "pw-" + name} for name in ("bulk1", "bulk2", "already", "bulk3", "bulk1")]
+    response = test_client.post("/admin/users/bulk", json=users, headers={"X-Admin-Key": "admin-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {(line["username"], line["status"]) for line in map(json.loads, response.text.splitlines())}
+    assert results == {
+        ("bulk1", "duplicate"), ("bulk1", "created"), ("bulk2", "created"),
+        ("already", "exists"), ("bulk3", "created"),
+    }
+    login = test_client.post(
+        "/login",
+        data={"username": "bulk3", "password": "pw-bulk3"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert login.status_code == 200
+    assert not auth_app.provision_lock.locked()
+
+def test_bulk_provision_requires_admin_key(test_client, monkeypatch):
+    """Teste que le provisionnement exige X-Admin-Key, et reste fermé sans ADMIN_API_KEY."""
+    import app as auth_app
+    users = [{"username": "nokey", "password": "password123"}]
+    monkeypatch.setattr(auth_app, "ADMIN_API_KEY", None)
+    assert test_client.post("/admin/users/bulk", json=users, headers={"X-Admin-Key": ""}).status_code == 403
+    monkeypatch.setattr(auth_app, "ADMIN_API_KEY", "admin-secret")
+    assert test_client.post("/admin/users/bulk", json=users, headers={"X-Admin-Key": "wrong"}).status_code == 403
+    monkeypatch.setattr(auth_app, "PROVISION_MAX_USERS", 0)
+    assert test_client.post("/admin/users/bulk", json=users, headers={"X-Admin-Key": "admin-secret"}).status_code == 413
+
+def test_api_key_lifecycle(test_client, db_session):
+    """Teste l'émission (clé renvoyée une fois, condensat stocké), la liste et la révocation d'une clé d'API."""
+    import hashlib
+    from app import ApiKey
+    token = _login(test_client, "robotowner")
+    auth = {"Authorization": f"Bearer {token}"}
+
+    response = test_client.post("/api-keys", json={"name": "ci"}, headers=auth)
+    assert response.status_code == 201
+    created = response.json()
+    assert created["key"].startswith("tk_") and created["key"].startswith(created["prefix"])
+    stored = db_session.query(ApiKey).filter(ApiKey.id == created["id"]).one()
+    assert stored.key_hash == hashlib.sha256(created["key"].encode()).hexdigest()
+
+    listed = test_client.get("/api-keys", headers=auth).json()
+    assert [k["name"] for k in listed] == ["ci"] and "key" not in listed[0]
+
+    assert test_client.delete(f"/api-keys/{created['id']}", headers=auth).status_code == 204
+    assert test_client.get("/api-keys", headers=auth).json()[0]["revoked_at"] is not None
+    assert test_client.delete(f"/api-keys/{created['id']}", headers=auth).status_code == 404
+
+def test_revoked_token_cannot_create_api_key(test_client):
+    """Teste qu'un jeton révoqué par /logout est refusé par les endpoints authentifiés (sauf /logout)."""
+    token = _login(test_client, "loggedout")
+    auth = {"Authorization": f"Bearer {token}"}
+    assert test_client.post("/logout", headers=auth).status_code == 204
+    assert test_client.post("/logout", headers=auth).status_code == 204  # idempotent
+    response = test_client.post("/api-keys", json={"name": "stolen"}, headers=auth)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+    assert test_client.get("/api-keys", headers=auth).status_code == 401
+
+def test_logout_all_revokes_tokens_and_api_keys(test_client, db_session):
+    """Teste que /logout-all coupe les jetons déjà émis et révoque les clés d'API de l'utilisateur."""
+    from app import ApiKey
+    token = _login(test_client, "compromised2")
+    auth = {"Authorization": f"Bearer {token}"}
+    for name in ("ci", "backup"):
+        assert test_client.post("/api-keys", json={"name": name}, headers=auth).status_code == 201
+
+    assert test_client.post("/logout-all", headers=auth).status_code == 204
+    assert test_client.post("/api-keys", json={"name": "after"}, headers=auth).status_code == 401
+    keys = db_session.query(ApiKey).filter(ApiKey.username == "compromised2").all()
+    assert len(keys) == 2 and all(key.revoked_at is not None for key in keys)
@@ -0,0 +1,110 @@
+"""
+Émission et vérification des JWT, avec une bibliothèque interchangeable.
+
+    backend = get_backend()            # JWT_BACKEND=jose (défaut) ou pyjwt
+    token = backend.encode(claims, key, "HS256")
+    claims = backend.decode(token, key, ["HS256"])   # lève TokenError si invalide
+
+Tous les backends produisent et acceptent les mêmes jetons (mêmes revendications,
+`exp`/`iat` en secondes epoch). Pour en ajouter un, implémenter encode/decode/
+get_unverified_header/key_from_jwk, déclarer `algorithms` et l'enregistrer avec
+register_backend().
+
+Algorithmes asymétriques : ES256 avec les deux backends, EdDSA (Ed25519) avec pyjwt
+seulement — python-jose ne l'implémente pas.
+"""
+import os
+
+
+class TokenError(Exception):
+    """Jeton invalide, expiré ou mal signé, quelle que soit la bibliothèque."""
+
+
+HMAC_ALGORITHMS = frozenset({"HS256", "HS384", "HS512"})
+RSA_EC_ALGORITHMS = frozenset({"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"})
+
+
+class JoseBackend:
+    name = "jose"
+    algorithms = HMAC_ALGORITHMS | RSA_EC_ALGORITHMS
+
+    def __init__(self):
+        from jose import jwt, JWTError
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: dict, key, algorithm: str, headers: dict | None = None) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key, algorithms: list[str]) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=algorithms)
+        except self._error as e:
+            raise TokenError(str(e)) from e
+
+    def get_unverified_header(self, token: str) -> dict:
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._error as e:
+            raise TokenError(str(e)) from e
+
+    def key_from_jwk(self, jwk: dict):
+        """Clé de vérification utilisable par decode() à partir d'un JWK public."""
+        if jwk.get("alg") not in self.algorithms:
+            raise TokenError(f"Unsupported JWK algorithm {jwk.get('alg')!r}")
+        return dict(jwk)
+
+
+class PyJWTBackend:
+    name = "pyjwt"
+    algorithms = HMAC_ALGORITHMS | RSA_EC_ALGORITHMS | {"EdDSA"}
+
+    def __init__(self):
+        import jwt
+        self._jwt = jwt
+
+    def encode(self, claims: dict, key, algorithm: str, headers: dict | None = None) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key, algorithms: list[str]) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=algorithms)
+        except self._jwt.PyJWTError as e:
+            raise TokenError(str(e)) from e
+
+    def get_unverified_header(self, token: str) -> dict:
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._jwt.PyJWTError as e:
+            raise TokenError(str(e)) from e
+
+    def key_from_jwk(self, jwk: dict):
+        """Clé de vérification utilisable par decode() à partir d'un JWK public."""
+        try:
+            return self._jwt.PyJWK(jwk).key
+        except self._jwt.PyJWTError as e:
+            raise TokenError(str(e)) from e
+
+
+_BACKENDS = {
+    JoseBackend.name: JoseBackend,
+    PyJWTBackend.name: PyJWTBackend,
+}
+_instances = {}
+
+
+def register_backend(name: str, backend_class):
+    _BACKENDS[name] = backend_class
+
+
+def available_backends() -> list[str]:
+    return sorted(_BACKENDS)
+
+
+def get_backend(name: str | None = None):
+    name = name or os.getenv("JWT_BACKEND", JoseBackend.name)
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown JWT backend {name!r} (available: {', '.join(available_backends())})")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
@@ -0,0 +1,122 @@
+"""
+Clés d'API des clients machines, émises par auth-api (POST /api-keys).
+
+Une clé (préfixe `tk_`) est présentée comme un jeton Bearer. auth-api ne stocke que
+son condensat SHA-256, sous un index unique de la table `api_keys` de la base
+partagée ; tasks-api le recherche directement (pas de JWT, pas de KDF : la clé est
+aléatoire sur 256 bits, un hachage rapide suffit). Une clé qui n'a pas la forme
+émise par auth-api (`tk_` + 43 caractères base64url) est refusée sans lookup.
+
+Le propriétaire d'une clé active est gardé dans un LRU (API_KEY_CACHE_SIZE entrées,
+défaut 1000) pendant API_KEY_CACHE_TTL secondes (défaut 60) : le trafic machine coûte
+un lookup en mémoire, et une révocation prend effet au plus tard après ce délai. Les
+clés inconnues ou révoquées vont dans un second LRU, plus petit
+(API_KEY_NEGATIVE_CACHE_SIZE, défaut 100) : un flot de clés invalides ne peut pas
+évincer les clés valides.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+from sqlalchemy.orm import Session
+
+from metrics import Counter
+
+API_KEY_PREFIX = "tk_"
+# Forme des clés émises par auth-api : API_KEY_PREFIX + secrets.token_urlsafe(32)
+API_KEY_PATTERN = re.compile(re.escape(API_KEY_PREFIX) + r"[A-Za-z0-9_-]{43}")
+
+HITS = Counter("api_key_cache_hits_total", "API key cache hits.")
+MISSES = Counter("api_key_cache_misses_total", "API key cache misses (database lookups).")
+
+# Table gérée par auth-api : décrite ici pour la lecture seulement, jamais créée par tasks-api
+api_keys = Table(
+    "api_keys",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("key_hash", String(64), unique=True, nullable=False),
+    Column("username", String, nullable=False),
+    Column("revoked_at", Integer, nullable=True),
+)
+
+
+def is_api_key(key: str) -> bool:
+    return API_KEY_PATTERN.fullmatch(key) is not None
+
+
+def api_key_digest(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def lookup_api_key(db: Session, digest: str):
+    """Utilisateur propriétaire d'une clé active, sinon None."""
+    return db.execute(
+        select(api_keys.c.username).where(api_keys.c.key_hash == digest, api_keys.c.revoked_at.is_(None))
+    ).scalar_one_or_none()
+
+
+class ApiKeyCache:
+    _MISSING = object()
+
+    def __init__(self, max_entries: int, ttl: float, max_negative: int = 100):
+        self.max_entries = max_entries
+        self.max_negative = max_negative
+        self.ttl = ttl
+        self._entries = OrderedDict()  # digest -> (expires_at, username)
+        self._negative = OrderedDict()  # digest -> expires_at (clé inconnue ou révoquée)
+        self._lock = threading.Lock()
+
+    def get(self, digest: str):
+        """(True, utilisateur ou None) si le résultat est en cache et frais, sinon (False, None)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest, self._MISSING)
+            if entry is not self._MISSING and entry[0] <= now:
+                del self._entries[digest]
+                entry = self._MISSING
+            if entry is self._MISSING:
+                expires_at = self._negative.get(digest)
+                if expires_at is not None and expires_at <= now:
+                    del self._negative[digest]
+                    expires_at = None
+                if expires_at is None:
+                    MISSES.inc()
+                    return False, None
+                self._negative.move_to_end(digest)
+                entry = (expires_at, None)
+            else:
+                self._entries.move_to_end(digest)
+        HITS.inc()
+        return True, entry[1]
+
+    def put(self, digest: str, username):
+        # Clés inconnues dans un LRU séparé : elles n'évincent jamais une clé valide
+        if username is None:
+            self._store(self._negative, self.max_negative, digest, time.monotonic() + self.ttl)
+        else:
+            self._store(self._entries, self.max_entries, digest, (time.monotonic() + self.ttl, username))
+
+    def _store(self, entries: OrderedDict, max_entries: int, digest: str, value):
+        if max_entries <= 0:
+            return
+        with self._lock:
+            entries[digest] = value
+            entries.move_to_end(digest)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._negative.clear()
+
+
+api_key_cache = ApiKeyCache(
+    max_entries=int(os.getenv("API_KEY_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("API_KEY_CACHE_TTL", "60")),
+    max_negative=int(os.getenv("API_KEY_NEGATIVE_CACHE_SIZE", "100")),
+)
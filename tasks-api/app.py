@@ -1,23 +1,63 @@
-import time
+import asyncio
 import os
+import base64
+import binascii
+import time
 from urllib.parse import quote_plus
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import create_engine, Column, Integer, String, Boolean
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from sqlalchemy import (
+    create_engine, text, select, insert, Engine, update, delete, any_, literal, bindparam,
+    ARRAY, BigInteger, Column, Integer, String, Boolean, Index,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from jose import jwt, JWTError
+from tokens import TokenError, get_backend
+from metrics import MetricsMiddleware, metrics_response
+from sql_timing import SQLTimingMiddleware, instrument_engine
+from token_cache import token_cache, token_digest
+from jwks import JWKSCache
+from revocation import revocations, RevocationSync, REVOCATIONS_URL, REVOCATION_FEED_KEY
+from api_keys import api_key_cache, api_key_digest, is_api_key, lookup_api_key, API_KEY_PREFIX
+from task_cache import task_cache, InvalidationListener, LISTENER_HEARTBEAT, NOTIFY_CHANNEL
+import task_json
+from task_json import check_fields, dump_task, dump_tasks
+from db_pool import pool_options, pool_stats, InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool
 
 # --- Configuration ---
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "un_secret_tres_fort_a_changer")
 ALGORITHM = "HS256"
+# Bibliothèque JWT (voir tokens.py) : "jose" par défaut ou "pyjwt"
+token_backend = get_backend()
+# Avec JWKS_URL, les jetons sont vérifiés par clé publique (ES256/EdDSA, voir jwks.py)
+# et le secret HS256 n'est plus accepté
+JWKS_URL = os.getenv("JWKS_URL")
+jwks_cache = JWKSCache(JWKS_URL, token_backend) if JWKS_URL else None
+
+# --- Pagination ---
+# Taille de page par défaut et maximale pour GET /tasks
+DEFAULT_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("TASKS_MAX_PAGE_SIZE", "500"))
+# Lignes lues (et écrites) par lot en mode streaming (Accept: application/x-ndjson ou ?stream=true)
+STREAM_BATCH_SIZE = int(os.getenv("TASKS_STREAM_BATCH_SIZE", "500"))
+# Nombre maximum de tâches (ou d'IDs) acceptées par les endpoints /tasks/bulk
+BULK_MAX_ITEMS = int(os.getenv("TASKS_BULK_MAX_ITEMS", "1000"))
+# Durée de conservation des suppressions pour GET /tasks/changes (défaut 30 jours) ;
+# un curseur plus ancien reçoit 410 et le client resynchronise tout
+TOMBSTONE_TTL = int(os.getenv("TASKS_TOMBSTONE_TTL", str(30 * 24 * 3600)))
 
 # --- Database Configuration ---
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 DB_HOST = os.getenv("DB_HOST", "db")
 DB_NAME = os.getenv("DB_NAME", "tasksdb")
+# Pilote : "psycopg2" (synchrone, par défaut) ou "asyncpg" (SQLAlchemy asyncio)
+DB_DRIVER = os.getenv("DB_DRIVER", "psycopg2")
 # Build DATABASE_URL based on environment
 # URL-encode the password to handle special characters like @
 DB_PASSWORD_ENCODED = quote_plus(DB_PASSWORD)
@@ -27,12 +67,17 @@ if DB_HOST.startswith("/cloudsql/"):
 else:
     # Local or GKE (TCP connection)
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD_ENCODED}@{DB_HOST}/{DB_NAME}"
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 Base = declarative_base()
 engine = None
 SessionLocal = None
+cache_listener = None
+revocation_sync = None
 
 app = FastAPI()
+app.add_middleware(SQLTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # --- Modèles de Données (Task) ---
@@ -42,6 +87,59 @@ class Task(Base):
     title = Column(String, index=True)
     completed = Column(Boolean, default=False)
     owner = Column(String, index=True) # Username du propriétaire
+    # Version de l'utilisateur (TaskVersion) à la dernière écriture ; NULL pour les lignes antérieures
+    seq = Column(BigInteger, nullable=True)
+
+    # Index composite pour la pagination par curseur (WHERE owner = ? AND id > ? ORDER BY id)
+    # et pour la synchronisation incrémentale (WHERE owner = ? AND seq > ?)
+    __table_args__ = (
+        Index("ix_tasks_owner_id", "owner", "id"),
+        Index("ix_tasks_owner_seq", "owner", "seq"),
+    )
+
+class TaskVersion(Base):
+    """
+    Version des tâches d'un utilisateur : incrémentée dans la transaction de chaque
+    écriture (bump_version), elle sert d'ETag aux lectures. Absente = version 0.
+    """
+    __tablename__ = "task_versions"
+    owner = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+class TaskTombstone(Base):
+    """Tâche supprimée, gardée TOMBSTONE_TTL secondes pour GET /tasks/changes."""
+    __tablename__ = "task_tombstones"
+    id = Column(Integer, primary_key=True, autoincrement=False)  # ID de la tâche supprimée (pas de séquence)
+    owner = Column(String, nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_task_tombstones_owner_seq", "owner", "seq"),)
+
+# Colonnes renvoyées par les lectures et les écritures (... RETURNING), dans l'ordre de TaskOut
+TASK_COLUMNS = (Task.id, Task.title, Task.completed, Task.owner)
+
+# Lectures en SQLAlchemy Core, construites une fois : des Row (tuples nommés) au lieu
+# d'objets ORM enregistrés dans l'identity map, et une forme compilée réutilisée par le
+# cache de compilation du moteur. Les IDs commencent à 1 : after_id=0 = première page.
+STREAM_TASKS = (
+    select(*TASK_COLUMNS)
+    .where(Task.owner == bindparam("owner"), Task.id > bindparam("after_id"))
+    .order_by(Task.id)
+)
+LIST_TASKS = STREAM_TASKS.limit(bindparam("limit"))
+READ_TASK = select(*TASK_COLUMNS).where(Task.id == bindparam("task_id"))
+CHANGED_TASKS = (
+    select(*TASK_COLUMNS)
+    .where(Task.owner == bindparam("owner"), Task.seq > bindparam("since"))
+    .order_by(Task.id)
+)
+DELETED_TASKS = (
+    select(TaskTombstone.id)
+    .where(TaskTombstone.owner == bindparam("owner"), TaskTombstone.seq > bindparam("since"))
+    .order_by(TaskTombstone.id)
+)
+READ_VERSION = select(TaskVersion.version).where(TaskVersion.owner == bindparam("owner"))
 
 class TaskCreate(BaseModel):
     title: str
@@ -58,8 +156,236 @@ class TaskOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True) # <-- Remplacement pour Pydantic v2
 
+check_fields(TaskOut)
+# Référence des réponses : les handlers sérialisent via task_json (mêmes octets, sans validation par ligne)
+TASK_LIST = TypeAdapter(list[TaskOut])
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+class TaskChanges(BaseModel):
+    """
+    Réponse de GET /tasks/changes : appliquer `tasks` (remplacement par ID) puis `deleted`.
+    `cursor` est absent (null) sur les pages d'une synchronisation complète sauf la dernière.
+    """
+    tasks: list[TaskOut]
+    deleted: list[int]
+    cursor: str | None
+
+class TaskSelection(BaseModel):
+    """Tâches ciblées par une opération en masse (ids et/ou filtre, combinés en ET)."""
+    ids: list[int] | None = None
+    completed: bool | None = None
+
+class TaskPatch(BaseModel):
+    title: str | None = None
+    completed: bool | None = None
+
+class TaskBulkUpdate(TaskSelection):
+    changes: TaskPatch
+
+class BulkItemResult(BaseModel):
+    id: int
+    status: str # "updated", "deleted" ou "not_found"
+
+class BulkResult(BaseModel):
+    results: list[BulkItemResult]
+
+# --- Curseur de pagination (opaque pour le client) ---
+def encode_cursor(task_id: int) -> str:
+    return base64.urlsafe_b64encode(str(task_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# --- ETag et GET conditionnel ---
+# private, no-cache : le navigateur garde la réponse mais la revalide à chaque fois
+# (If-None-Match), ce qui coûte un 304 sans corps tant que rien n'a changé.
+CACHE_CONTROL = "private, no-cache"
+
+def task_etag(version: int, *parts) -> str:
+    return '"' + ":".join(str(part) for part in (f"v{version}", *parts)) + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    # Comparaison faible (RFC 9110) : le préfixe W/ est ignoré
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+# --- Curseur de synchronisation : version de l'utilisateur + date d'émission ---
+# (+ dernier ID renvoyé pour les pages d'une synchronisation complète)
+def encode_sync_cursor(version: int, issued_at: int, after_id: int | None = None) -> str:
+    fields = (version, issued_at) if after_id is None else (version, issued_at, after_id)
+    return base64.urlsafe_b64encode(":".join(map(str, fields)).encode()).decode().rstrip("=")
+
+def decode_sync_cursor(cursor: str, page: bool = False) -> tuple[int, ...]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fields = tuple(int(field) for field in base64.urlsafe_b64decode(padded.encode()).decode().split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(fields) != (3 if page else 2):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return fields
+
+def task_list_response(body: bytes, next_cursor: str | None, etag: str, cache_status: str) -> Response:
+    headers = {"X-Cache": cache_status, "ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def task_json_response(body: bytes, status_code: int = status.HTTP_200_OK) -> Response:
+    """Réponse déjà sérialisée par task_json : response_model ne sert plus qu'à la documentation."""
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+# --- Listes en streaming ---
+class TaskStreamEncoder:
+    """Sérialise des lots de lignes en NDJSON (une tâche par ligne) ou en fragments d'un tableau JSON."""
+
+    def __init__(self, ndjson: bool):
+        self.ndjson = ndjson
+        self.media_type = NDJSON_MEDIA_TYPE if ndjson else "application/json"
+        self._first = True
+
+    def prefix(self) -> bytes:
+        return b"" if self.ndjson else b"["
+
+    def batch(self, rows) -> bytes:
+        items = [dump_task(row) for row in rows]
+        if self.ndjson:
+            return b"".join(item + b"\n" for item in items)
+        chunk = b",".join(items)
+        if items and not self._first:
+            chunk = b"," + chunk
+        self._first = self._first and not items
+        return chunk
+
+    def suffix(self) -> bytes:
+        return b"" if self.ndjson else b"]"
+
+def stream_task_list(db, owner: str, after_id: int | None, ndjson: bool) -> StreamingResponse:
+    """
+    Toute la liste à partir du curseur, écrite lot par lot au fil de la lecture : mémoire
+    en O(lot) et premier octet envoyé avant la fin de la requête SQL. Une erreur en cours
+    de route tronque la réponse (tableau JSON non refermé).
+    """
+    # yield_per : curseur côté serveur, lu par lots de STREAM_BATCH_SIZE lignes
+    stmt = STREAM_TASKS.execution_options(yield_per=STREAM_BATCH_SIZE)
+    params = {"owner": owner, "after_id": after_id or 0}
+    encoder = TaskStreamEncoder(ndjson)
+    if isinstance(db, AsyncSession):
+        async def body():
+            yield encoder.prefix()
+            result = await db.stream(stmt, params)
+            async for rows in result.partitions():
+                yield encoder.batch(rows)
+            yield encoder.suffix()
+    else:
+        # Itéré dans le pool de threads par StreamingResponse
+        def body():
+            yield encoder.prefix()
+            for rows in db.execute(stmt, params).partitions():
+                yield encoder.batch(rows)
+            yield encoder.suffix()
+    return StreamingResponse(body(), media_type=encoder.media_type, headers={"X-Cache": "BYPASS"})
+
+# --- Écritures en une seule requête ---
+def raise_missing_or_forbidden(db: Session, task_id: int, action: str):
+    """
+    Appelé uniquement quand une écriture filtrée sur (id, owner) n'a touché aucune ligne :
+    une lecture de contrôle distingue alors 404 (tâche absente) de 403 (autre propriétaire).
+    Rien n'est validé : la fermeture de la session (get_db) annule la version incrémentée.
+    """
+    if db.query(Task.id).filter(Task.id == task_id).first() is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    raise HTTPException(status_code=403, detail=f"Not authorized to {action} this task")
+
+# --- Opérations en masse ---
+def check_selection(selection: TaskSelection):
+    if selection.ids is None and selection.completed is None:
+        raise HTTPException(status_code=422, detail="Provide ids or a filter")
+    if selection.ids is not None and len(selection.ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many ids in one request (max {BULK_MAX_ITEMS})")
+
+def selection_clause(db: Session, owner: str, selection: TaskSelection):
+    """Clause WHERE d'une opération en masse : la propriété est vérifiée en SQL."""
+    clauses = [Task.owner == owner]
+    if selection.ids is not None:
+        if db.get_bind().dialect.name == "postgresql":
+            # Un seul paramètre tableau : le plan reste le même quelle que soit la taille de la liste
+            clauses.append(Task.id == any_(literal(selection.ids, ARRAY(Integer))))
+        else:
+            clauses.append(Task.id.in_(selection.ids))
+    if selection.completed is not None:
+        clauses.append(Task.completed == selection.completed)
+    return clauses
+
+def bulk_results(selection: TaskSelection, touched: set[int], done: str) -> BulkResult:
+    if selection.ids is None:
+        return BulkResult(results=[BulkItemResult(id=i, status=done) for i in sorted(touched)])
+    # Une tâche inexistante, d'un autre utilisateur ou hors filtre est rapportée "not_found"
+    return BulkResult(results=[
+        BulkItemResult(id=i, status=done if i in touched else "not_found")
+        for i in dict.fromkeys(selection.ids)
+    ])
+
+# --- Schéma ---
+# PostgreSQL : chaque écriture sur `tasks` publie le propriétaire concerné (voir task_cache.py).
+# Postgres fusionne les notifications identiques d'une même transaction.
+TASKS_NOTIFY_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION tasks_notify_invalidate() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', OLD.owner);
+        ELSE
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', NEW.owner);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tasks_notify_invalidate ON tasks",
+    """
+    CREATE TRIGGER tasks_notify_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION tasks_notify_invalidate()
+    """,
+]
+
+# create_all n'ajoute pas les nouvelles colonnes à une table déjà existante
+TASKS_MIGRATION_DDL = ["ALTER TABLE tasks ADD COLUMN IF NOT EXISTS seq BIGINT"]
+
+def run_ddl(bind, statements):
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            for ddl in statements:
+                conn.execute(text(ddl))
+    else:
+        for ddl in statements:
+            bind.execute(text(ddl))
+
+def init_schema(bind):
+    Base.metadata.create_all(bind=bind)
+    if bind.dialect.name == "postgresql":
+        run_ddl(bind, TASKS_MIGRATION_DDL)
+    # create_all ne crée pas les nouveaux index sur une table déjà existante
+    for index in Task.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
+    if bind.dialect.name == "postgresql":
+        run_ddl(bind, TASKS_NOTIFY_DDL)
+
 # --- Dépendance DB ---
-def get_db():
+async def get_db():
+    """
+    Fournit une Session (mode par défaut, psycopg2) ou une AsyncSession (DB_DRIVER=asyncpg).
+    Les endpoints n'utilisent la session qu'au travers de run_db().
+    """
     if SessionLocal is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -69,64 +395,403 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
+        if isinstance(db, AsyncSession):
+            await db.close()
+        else:
+            await run_in_threadpool(db.close)
+
+async def run_db(db, fn, *args):
+    """
+    Exécute fn(session, *args), qui contient tout l'accès base d'un endpoint.
+    En mode asyncpg, fn tourne sur la boucle d'événements via AsyncSession.run_sync
+    (pas de thread) ; sinon dans le pool de threads, comme un endpoint `def` classique.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
 
 # --- Dépendance d'authentification (validation JWT) ---
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Clé d'API d'un client machine : condensat SHA-256 + LRU, sans JWT (voir api_keys.py)
+    if token.startswith(API_KEY_PREFIX):
+        if not is_api_key(token):
+            raise credentials_exception
+        digest = api_key_digest(token)
+        hit, username = api_key_cache.get(digest)
+        if not hit:
+            username = await run_db(db, lookup_api_key, digest)
+            api_key_cache.put(digest, username)
+        if username is None:
+            raise credentials_exception
+        return username
+    # Un jeton déjà vérifié (et non expiré) n'est pas redécodé : voir token_cache.py
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        # La révocation est vérifiée à chaque requête, y compris sur un hit (voir revocation.py)
+        if revocations.is_revoked(payload):
+            raise credentials_exception
+        return payload["sub"]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if jwks_cache is not None:
+            algorithm, key = await jwks_cache.resolve(token)
+            payload = token_backend.decode(token, key, algorithms=[algorithm])
+        else:
+            payload = token_backend.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        token_cache.put(digest, payload)
+        if revocations.is_revoked(payload):
+            raise credentials_exception
         return username
-    except JWTError:
+    except TokenError:
         raise credentials_exception
 
+# --- Accès aux données (exécuté via run_db) ---
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def bump_version(db: Session, owner: str) -> int:
+    """
+    Incrémente la version de `owner` en début de transaction d'écriture et la renvoie
+    (elle devient le `seq` des lignes écrites). Le verrou pris sur la ligne de version
+    jusqu'au commit sérialise les écritures d'un même utilisateur : les `seq` sont
+    visibles dans l'ordre, ce qui rend sûr le curseur de GET /tasks/changes.
+    """
+    stmt = DIALECT_INSERTS[db.get_bind().dialect.name](TaskVersion).values(owner=owner, version=1)
+    return db.execute(stmt.on_conflict_do_update(
+        index_elements=[TaskVersion.owner],
+        set_={"version": TaskVersion.version + 1},
+    ).returning(TaskVersion.version)).scalar_one()
+
+def record_deletions(db: Session, owner: str, task_ids, version: int):
+    """Pierres tombales des tâches supprimées, puis purge de celles de plus de TOMBSTONE_TTL secondes."""
+    now = int(time.time())
+    stmt = DIALECT_INSERTS[db.get_bind().dialect.name](TaskTombstone).values([
+        {"id": task_id, "owner": owner, "seq": version, "deleted_at": now} for task_id in task_ids
+    ])
+    # SQLite peut réutiliser l'ID d'une tâche supprimée : la pierre tombale est alors remplacée
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[TaskTombstone.id],
+        set_={"seq": stmt.excluded.seq, "deleted_at": stmt.excluded.deleted_at},
+    ))
+    db.execute(delete(TaskTombstone).where(TaskTombstone.owner == owner, TaskTombstone.deleted_at < now - TOMBSTONE_TTL))
+
+def db_owner_version(db: Session, owner: str) -> int:
+    # Une lecture par clé primaire de task_versions : la table tasks n'est pas touchée
+    return db.execute(READ_VERSION, {"owner": owner}).scalar() or 0
+
+def db_create_task(db: Session, owner: str, title: str):
+    # INSERT ... RETURNING : pas de SELECT de rafraîchissement après le commit
+    version = bump_version(db, owner)
+    stmt = (
+        insert(Task)
+        .values(title=title, owner=owner, completed=False, seq=version)
+        .returning(*TASK_COLUMNS)
+    )
+    row = db.execute(stmt).one()
+    db.commit()
+    return row
+
+def db_create_tasks(db: Session, owner: str, titles: list[str]):
+    version = bump_version(db, owner)
+    stmt = (
+        insert(Task)
+        .values([{"title": title, "owner": owner, "completed": False, "seq": version} for title in titles])
+        .returning(*TASK_COLUMNS)
+    )
+    rows = db.execute(stmt).all()
+    db.commit()
+    # L'ordre de RETURNING n'est pas garanti : les IDs suivent l'ordre d'insertion
+    return sorted(rows, key=lambda row: row.id)
+
+def db_list_tasks(db: Session, owner: str, after_id: int | None, limit: int):
+    return db.execute(LIST_TASKS, {"owner": owner, "after_id": after_id or 0, "limit": limit}).all()
+
+def db_update_tasks(db: Session, owner: str, selection: TaskSelection, changes: dict):
+    version = bump_version(db, owner)
+    stmt = (
+        update(Task)
+        .where(*selection_clause(db, owner, selection))
+        .values(**changes, seq=version)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    touched = set(db.execute(stmt).scalars())
+    if not touched:
+        return touched  # sans commit : la version incrémentée est annulée à la fermeture de la session
+    db.commit()
+    return touched
+
+def db_delete_tasks(db: Session, owner: str, selection: TaskSelection):
+    version = bump_version(db, owner)
+    stmt = (
+        delete(Task)
+        .where(*selection_clause(db, owner, selection))
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    touched = set(db.execute(stmt).scalars())
+    if not touched:
+        return touched
+    record_deletions(db, owner, sorted(touched), version)
+    db.commit()
+    return touched
+
+def db_read_task(db: Session, owner: str, task_id: int):
+    db_task = db.execute(READ_TASK, {"task_id": task_id}).first()
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if db_task.owner != owner:
+        raise HTTPException(status_code=403, detail="Not authorized to access this task")
+    return db_task
+
+def db_read_task_version(db: Session, owner: str, task_id: int):
+    # Version lue avant la tâche : une écriture concurrente ne peut que rendre l'ETag trop ancien
+    version = db_owner_version(db, owner)
+    return version, db_read_task(db, owner, task_id)
+
+def db_delete_task(db: Session, owner: str, task_id: int):
+    version = bump_version(db, owner)
+    stmt = (
+        delete(Task)
+        .where(Task.id == task_id, Task.owner == owner)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).first() is None:
+        raise_missing_or_forbidden(db, task_id, "delete")
+    record_deletions(db, owner, [task_id], version)
+    db.commit()
+
+def db_update_task(db: Session, owner: str, task_id: int, title: str, completed: bool):
+    # UPDATE ... RETURNING, filtré sur le propriétaire
+    version = bump_version(db, owner)
+    stmt = (
+        update(Task)
+        .where(Task.id == task_id, Task.owner == owner)
+        .values(title=title, completed=completed, seq=version)
+        .returning(*TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(stmt).first()
+    if row is None:
+        raise_missing_or_forbidden(db, task_id, "update")
+    db.commit()
+    return row
+
 # --- Endpoints CRUD pour les Tâches ---
 @app.post("/tasks", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     task: TaskCreate, 
     db: Session = Depends(get_db), 
     current_user: str = Depends(get_current_user)
 ):
-    db_task = Task(title=task.title, owner=current_user, completed=False)
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    row = await run_db(db, db_create_task, current_user, task.title)
+    task_cache.invalidate(current_user)
+    return task_json_response(dump_task(row), status.HTTP_201_CREATED)
+
+@app.post("/tasks/bulk", response_model=list[TaskOut], status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+    tasks: list[TaskCreate],
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Crée plusieurs tâches en une seule requête INSERT multi-lignes (... RETURNING)
+    et une seule transaction. Les tâches sont renvoyées dans l'ordre d'envoi.
+    """
+    if len(tasks) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many tasks in one request (max {BULK_MAX_ITEMS})"
+        )
+    if not tasks:
+        return []
+    rows = await run_db(db, db_create_tasks, current_user, [t.title for t in tasks])
+    task_cache.invalidate(current_user)
+    return task_json_response(dump_tasks(rows), status.HTTP_201_CREATED)
 
 @app.get("/tasks", response_model=list[TaskOut])
-def read_tasks(
+async def read_tasks(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    stream: bool = False,
+    accept: str | None = Header(None),
+    if_none_match: str | None = Header(None),
     db: Session = Depends(get_db), 
     current_user: str = Depends(get_current_user)
 ):
-    tasks = db.query(Task).filter(Task.owner == current_user).all()
-    return tasks
+    """
+    Liste les tâches de l'utilisateur connecté, page par page, triées par ID.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor
+    (absent sur la dernière page) et se repasse tel quel via ?after=.
+    Les pages sérialisées sont gardées en cache jusqu'à la prochaine écriture.
+
+    Chaque page porte un ETag tiré de la version de l'utilisateur (TaskVersion) ;
+    If-None-Match correspondant : 304 sans corps, après une simple lecture de la
+    version (ou aucune requête si la page est en cache).
+
+    Avec `Accept: application/x-ndjson` (une tâche par ligne) ou `?stream=true`
+    (tableau JSON envoyé par fragments), toute la liste après ?after= est diffusée
+    sans pagination ni cache : voir stream_task_list.
+    """
+    after_id = decode_cursor(after) if after is not None else None
+    ndjson = accept is not None and NDJSON_MEDIA_TYPE in accept
+    if stream or ndjson:
+        return stream_task_list(db, current_user, after_id, ndjson)
+    cache_key = (after_id, limit)
+    cached = task_cache.get(current_user, cache_key)
+    if cached is not None:
+        body, next_cursor, etag = cached
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        return task_list_response(body, next_cursor, etag, "HIT")
+
+    generation = task_cache.generation(current_user)
+    # Version lue avant les tâches : une écriture concurrente ne peut que rendre l'ETag trop ancien
+    version = await run_db(db, db_owner_version, current_user)
+    etag = task_etag(version, after_id or 0, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    # On lit une ligne de plus pour savoir s'il reste une page
+    tasks = await run_db(db, db_list_tasks, current_user, after_id, limit + 1)
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(tasks[-1].id)
+    body = dump_tasks(tasks)
+    task_cache.put(current_user, cache_key, (body, next_cursor, etag), len(body), generation)
+    return task_list_response(body, next_cursor, etag, "MISS")
+
+def db_task_changes(db: Session, owner: str, since: int):
+    """Version courante, tâches écrites et IDs supprimés depuis `since`."""
+    # Version lue en premier : tout ce qui a seq <= version est déjà visible (voir bump_version) ;
+    # une écriture concurrente plus récente sera renvoyée une seconde fois, sans perte
+    version = db_owner_version(db, owner)
+    if since >= version:
+        return version, [], []
+    params = {"owner": owner, "since": since}
+    return version, db.execute(CHANGED_TASKS, params).all(), list(db.execute(DELETED_TASKS, params).scalars())
+
+# Déclarée avant /tasks/{task_id}, qui capturerait "changes" comme ID
+@app.get("/tasks/changes", response_model=TaskChanges)
+async def read_task_changes(
+    since: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Synchronisation incrémentale : tâches créées ou modifiées (`tasks`) et IDs supprimés
+    (`deleted`) depuis le curseur `since`, plus le curseur suivant (`cursor`). Quand rien
+    n'a changé, une simple lecture de la version suffit et la réponse tient en quelques octets.
+
+    Sans `since`, synchronisation complète page par page, comme GET /tasks : `limit`
+    tâches par page, page suivante via ?after= avec l'en-tête X-Next-Cursor, et `cursor`
+    renseigné sur la dernière page seulement. La version est lue à la première page et
+    portée par X-Next-Cursor : une écriture pendant le parcours est rattrapée par le
+    premier appel avec `since`.
+
+    Les suppressions sont conservées TOMBSTONE_TTL secondes : un curseur plus ancien
+    reçoit 410 Gone, et le client repart d'une synchronisation complète (sans `since`).
+    """
+    now = int(time.time())
+    next_cursor = None
+    if since is not None:
+        if after is not None:
+            raise HTTPException(status_code=400, detail="after is only valid without since")
+        since_version, issued_at = decode_sync_cursor(since)
+        if now - issued_at >= TOMBSTONE_TTL:
+            raise HTTPException(status_code=410, detail="Cursor expired, resync without since")
+        version, rows, deleted = await run_db(db, db_task_changes, current_user, since_version)
+        issued_at = now
+    else:
+        if after is None:
+            version, issued_at, after_id = await run_db(db, db_owner_version, current_user), now, None
+        else:
+            version, issued_at, after_id = decode_sync_cursor(after, page=True)
+            if now - issued_at >= TOMBSTONE_TTL:
+                raise HTTPException(status_code=410, detail="Cursor expired, resync without since")
+        # On lit une ligne de plus pour savoir s'il reste une page
+        rows, deleted = await run_db(db, db_list_tasks, current_user, after_id, limit + 1), []
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_sync_cursor(version, issued_at, rows[-1].id)
+    cursor = encode_sync_cursor(version, issued_at) if next_cursor is None else None
+    body = b"".join((
+        b'{"tasks":', dump_tasks(rows),
+        b',"deleted":', task_json.dumps(deleted),
+        b',"cursor":', task_json.dumps(cursor), b"}",
+    ))
+    response = task_json_response(body)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+@app.patch("/tasks/bulk", response_model=BulkResult)
+async def update_tasks_bulk(
+    body: TaskBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Met à jour plusieurs tâches en une seule requête UPDATE ... RETURNING id.
+    """
+    check_selection(body)
+    changes = body.changes.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=422, detail="No changes provided")
+    touched = await run_db(db, db_update_tasks, current_user, body, changes)
+    task_cache.invalidate(current_user)
+    return bulk_results(body, touched, "updated")
+
+@app.delete("/tasks/bulk", response_model=BulkResult)
+async def delete_tasks_bulk(
+    body: TaskSelection,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Supprime plusieurs tâches en une seule requête DELETE ... RETURNING id
+    (par exemple toutes les tâches terminées avec {"completed": true}).
+    """
+    check_selection(body)
+    touched = await run_db(db, db_delete_tasks, current_user, body)
+    task_cache.invalidate(current_user)
+    return bulk_results(body, touched, "deleted")
 
 @app.get("/tasks/{task_id}", response_model=TaskOut)
-def read_task(
+async def read_task(
     task_id: int,
+    if_none_match: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
     """
     Récupère une tâche spécifique par ID.
     Vérifie que la tâche appartient bien à l'utilisateur connecté.
+    ETag conditionnel comme GET /tasks (version de l'utilisateur et ID de la tâche) ;
+    le 304 ne vient qu'après les contrôles 404/403, jamais pour une tâche absente ou
+    d'un autre utilisateur.
     """
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if db_task.owner != current_user:
-        raise HTTPException(status_code=403, detail="Not authorized to access this task")
-    return db_task
+    version, row = await run_db(db, db_read_task_version, current_user, task_id)
+    etag = task_etag(version, f"t{task_id}")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response = task_json_response(dump_task(row))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
 
 @app.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task_id: int,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
@@ -135,20 +800,12 @@ def delete_task(
     Supprime une tâche par ID.
     Vérifie que la tâche appartient bien à l'utilisateur connecté avant de la supprimer.
     """
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if db_task.owner != current_user:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this task")
-
-    db.delete(db_task)
-    db.commit()
+    await run_db(db, db_delete_task, current_user, task_id)
+    task_cache.invalidate(current_user)
     return
 
 @app.put("/tasks/{task_id}", response_model=TaskOut)
-def update_task(
+async def update_task(
     task_id: int,
     task: TaskUpdate,
     db: Session = Depends(get_db),
@@ -158,30 +815,44 @@ def update_task(
     Met à jour une tâche par ID (titre et statut complété).
     Vérifie que la tâche appartient bien à l'utilisateur connecté avant de la mettre à jour.
     """
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+    row = await run_db(db, db_update_task, current_user, task_id, task.title, task.completed)
+    task_cache.invalidate(current_user)
+    return task_json_response(dump_task(row))
 
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if db_task.owner != current_user:
-        raise HTTPException(status_code=403, detail="Not authorized to update this task")
 
-    # Mettre à jour les champs
-    db_task.title = task.title
-    db_task.completed = task.completed
+# --- Moteur de base de données ---
+def create_db_engine():
+    """
+    Moteur synchrone (psycopg2) par défaut, asynchrone (asyncpg) si DB_DRIVER=asyncpg.
+    Le pool est réglé par les variables DB_POOL_* (voir db_pool.py).
+    """
+    if DB_DRIVER == "asyncpg":
+        return instrument_engine(create_async_engine(
+            ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncAdaptedQueuePool, **pool_options()
+        ))
+    return instrument_engine(
+        create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_options())
+    )
 
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+def create_session_factory(bind):
+    if isinstance(bind, AsyncEngine):
+        return async_sessionmaker(bind=bind, autoflush=False)
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind)
 
+async def setup_schema(bind):
+    if isinstance(bind, AsyncEngine):
+        async with bind.begin() as conn:
+            await conn.run_sync(init_schema)
+    else:
+        await run_in_threadpool(init_schema, bind)
 
 @app.get("/init-db")
-def init_db():
+async def init_db():
     try:
         global engine
         if engine is None:
-             engine = create_engine(DATABASE_URL)
-        Base.metadata.create_all(bind=engine)
+             engine = create_db_engine()
+        await setup_schema(engine)
         return {"status": "success", "message": "Tables created"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -191,27 +862,68 @@ def health_check():
     """Health check endpoint for Kubernetes liveness and readiness probes."""
     return {"status": "healthy"}
 
+@app.get("/pool-stats")
+def read_pool_stats():
+    """Statistiques du pool de connexions (connexions utilisées, overflow, temps d'attente)."""
+    return pool_stats.snapshot(engine.pool if engine is not None else None)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Métriques au format Prometheus (requêtes, latences, pool de connexions)."""
+    return metrics_response()
+
+pool_stats.bind(lambda: engine.pool if engine is not None else None)
+
+def start_cache_listener():
+    """Abonne ce worker aux invalidations des autres réplicas (PostgreSQL uniquement)."""
+    global cache_listener
+    if os.getenv("TASKS_CACHE_NOTIFY", "true").lower() != "true" or not task_cache.enabled:
+        return
+    if engine is None or engine.dialect.name != "postgresql":
+        return
+    cache_listener = InvalidationListener(task_cache, DATABASE_URL, heartbeat=LISTENER_HEARTBEAT)
+    cache_listener.start()
+
+def start_revocation_sync():
+    """Recopie les révocations publiées par auth-api (si REVOCATIONS_URL est défini)."""
+    global revocation_sync
+    if not REVOCATIONS_URL:
+        return
+    if not REVOCATION_FEED_KEY:
+        print("REVOCATIONS_URL is set but REVOCATION_FEED_KEY is not: auth-api will refuse the feed")
+    revocation_sync = RevocationSync(revocations, REVOCATIONS_URL)
+    revocation_sync.start()
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     global engine, SessionLocal
+    start_revocation_sync()
     # Tentative de connexion à la base de données au démarrage
     max_retries = 10
     retry_delay = 5
     
     for i in range(max_retries):
         try:
-            print(f"Connecting to database at {DATABASE_URL}...")
-            engine = create_engine(DATABASE_URL)
-            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-            Base.metadata.create_all(bind=engine)
+            print(f"Connecting to database at {DATABASE_URL} (driver: {DB_DRIVER})...")
+            engine = create_db_engine()
+            SessionLocal = create_session_factory(engine)
+            await setup_schema(engine)
             print("Database connection successful.")
+            start_cache_listener()
             return
         except Exception as e:
             print(f"Waiting for database... ({i+1}/{max_retries}). Error: {e}")
-            time.sleep(retry_delay)
+            await asyncio.sleep(retry_delay)
     
     print("Could not connect to database. Application will start but DB endpoints will fail.")
 
+@app.on_event("shutdown")
+def on_shutdown():
+    if cache_listener is not None:
+        cache_listener.stop()
+    if revocation_sync is not None:
+        revocation_sync.stop()
+
 if __name__ == "__main__":
     import uvicorn
     print("Démarrage du serveur Uvicorn...")
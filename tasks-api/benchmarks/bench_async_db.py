@@ -0,0 +1,87 @@
+"""
+Benchmark de débit : tasks-api en mode synchrone (psycopg2) vs asynchrone (asyncpg).
+
+Le script envoie des requêtes concurrentes à une instance déjà démarrée et affiche
+le débit (req/s) et les latences p50/p95/p99. Pour reproduire la limite CPU du
+déploiement Kubernetes (k8s-manifests/tasks-api.yml : limits.cpu = 200m), lancer
+chaque mode dans un conteneur limité à 0,2 CPU :
+
+    docker build -t tasks-api ./tasks-api
+    docker run --rm --cpus=0.2 -p 8002:8000 --network <réseau de la db> \\
+        -e DB_HOST=db -e DB_DRIVER=psycopg2 tasks-api
+    python benchmarks/bench_async_db.py --url http://localhost:8002 --concurrency 100
+
+puis recommencer avec -e DB_DRIVER=asyncpg et comparer les deux sorties.
+
+Le jeton est signé localement avec JWT_SECRET_KEY (même valeur que le serveur).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from jose import jwt
+
+
+def make_token(username: str) -> str:
+    secret = os.getenv("JWT_SECRET_KEY", "un_secret_tres_fort_a_changer")
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    return jwt.encode({"sub": username, "exp": expire}, secret, algorithm="HS256")
+
+
+async def seed(client: httpx.AsyncClient, count: int):
+    """Crée `count` tâches pour que GET /tasks lise une page pleine."""
+    if count:
+        response = await client.post("/tasks/bulk", json=[{"title": f"bench {i}"} for i in range(count)])
+        response.raise_for_status()
+
+
+async def worker(client: httpx.AsyncClient, deadline: float, mix: str, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if mix == "write":
+                response = await client.post("/tasks", json={"title": "bench"})
+            else:
+                response = await client.get("/tasks")
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {make_token(args.user)}"}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=30) as client:
+        await seed(client, args.seed)
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, deadline, args.mix, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print("Aucune requête terminée.")
+        return
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"mix={args.mix} concurrency={args.concurrency} duration={elapsed:.1f}s")
+    print(f"requests={len(latencies)} errors={len(errors)} throughput={len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50={quantiles[49] * 1000:.1f}ms p95={quantiles[94] * 1000:.1f}ms p99={quantiles[98] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--user", default="bench-user")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30.0, help="durée en secondes")
+    parser.add_argument("--mix", choices=["read", "write"], default="read")
+    parser.add_argument("--seed", type=int, default=100, help="tâches créées avant la mesure")
+    asyncio.run(run(parser.parse_args()))
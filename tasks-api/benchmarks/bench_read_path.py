@@ -0,0 +1,80 @@
+"""
+Benchmark : CPU par ligne de la lecture d'une page de tâches, ORM vs Core précompilé.
+
+    cd tasks-api && python benchmarks/bench_read_path.py --rows 10000 --page 100 1000
+
+Sur une base SQLite en mémoire (aucune latence réseau : on mesure le coût Python),
+compare pour chaque taille de page :
+
+- orm : db.query(Task)...limit().all(), l'ancien db_list_tasks (objets ORM suivis
+  dans l'identity map de la session) ;
+- core : db_list_tasks, un select() des quatre colonnes construit une fois au niveau
+  du module et renvoyant des Row.
+
+Chaque variante lit la page puis la sérialise avec task_json (comme GET /tasks) ; le
+temps CPU du processus (time.process_time) est rapporté par ligne. --database-url
+permet de viser PostgreSQL pour inclure le coût du driver.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import Base, Task, db_list_tasks  # noqa: E402
+from task_json import dump_tasks  # noqa: E402
+
+OWNER = "bench-reader"
+
+
+def orm_list_tasks(db, owner: str, after_id, limit: int):
+    query = db.query(Task).filter(Task.owner == owner)
+    if after_id is not None:
+        query = query.filter(Task.id > after_id)
+    return query.order_by(Task.id).limit(limit).all()
+
+
+def cpu_per_row(session_factory, list_fn, page: int, iterations: int) -> float:
+    rows = 0
+    with session_factory() as db:
+        dump_tasks(list_fn(db, OWNER, None, page))  # échauffement (cache de compilation)
+    start = time.process_time()
+    for _ in range(iterations):
+        # Une session par itération, comme une requête HTTP
+        with session_factory() as db:
+            tasks = list_fn(db, OWNER, None, page)
+            dump_tasks(tasks)
+            rows += len(tasks)
+    return (time.process_time() - start) / rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=10_000, help="tâches insérées pour l'utilisateur")
+    parser.add_argument("--page", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.query(Task).filter(Task.owner == OWNER).delete()
+        db.execute(insert(Task), [{"title": f"bench {i}", "owner": OWNER, "completed": i % 2 == 0} for i in range(args.rows)])
+        db.commit()
+
+    try:
+        for page in args.page:
+            iterations = max(5, args.iterations * 100 // page)
+            orm = cpu_per_row(session_factory, orm_list_tasks, page, iterations)
+            core = cpu_per_row(session_factory, db_list_tasks, page, iterations)
+            print(f"page={page:<6} orm {orm * 1e6:7.2f} µs/row   core {core * 1e6:7.2f} µs/row   x{orm / core:.2f}")
+    finally:
+        with session_factory() as db:
+            db.query(Task).filter(Task.owner == OWNER).delete()
+            db.commit()
@@ -0,0 +1,66 @@
+"""
+Benchmark : sérialisation d'une liste de tâches, par validation Pydantic ou via task_json.
+
+    cd tasks-api && python benchmarks/bench_serialization.py --iterations 200
+
+Pour 1, 100 et 10 000 lignes (objets ORM, comme renvoyés par db_list_tasks), compare
+TypeAdapter(list[TaskOut]) (validate_python + dump_json : le chemin d'origine),
+task_json avec pydantic_core.to_json, et task_json avec orjson s'il est installé.
+Les trois produisent les mêmes octets, vérifiés avant la mesure.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import task_json  # noqa: E402
+from app import Task, TASK_LIST  # noqa: E402
+
+
+def make_rows(count: int):
+    return [Task(id=i, title=f"Tâche n°{i} à faire", completed=i % 3 == 0, owner="alice") for i in range(1, count + 1)]
+
+
+def pydantic_path(rows) -> bytes:
+    return TASK_LIST.dump_json(TASK_LIST.validate_python(rows, from_attributes=True))
+
+
+def task_json_path(dumps):
+    def run(rows) -> bytes:
+        return dumps([task_json.task_dict(row) for row in rows])
+    return run
+
+
+def bench(fn, rows, iterations: int) -> float:
+    fn(rows)  # échauffement
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(rows)
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    args = parser.parse_args()
+
+    paths = {"pydantic validate+dump": pydantic_path, "task_json pydantic_core": task_json_path(task_json._dumps_pydantic)}
+    if task_json.orjson is not None:
+        paths["task_json orjson"] = task_json_path(task_json.orjson.dumps)
+    else:
+        print("orjson is not installed: skipping the orjson path")
+
+    for size in args.sizes:
+        rows = make_rows(size)
+        expected = pydantic_path(rows)
+        iterations = max(5, args.iterations * 100 // max(size, 100))
+        baseline = None
+        print(f"{size} rows ({len(expected)} bytes, {iterations} iterations)")
+        for name, fn in paths.items():
+            assert fn(rows) == expected, f"{name} output differs"
+            seconds = bench(fn, rows, iterations)
+            baseline = baseline or seconds
+            print(f"  {name:<26} {seconds * 1e6:10.1f} µs  {seconds / size * 1e9:8.0f} ns/row  x{baseline / seconds:.2f}")
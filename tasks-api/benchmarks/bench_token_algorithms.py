@@ -0,0 +1,76 @@
+"""
+Benchmark : coût de vérification d'un jeton selon l'algorithme de signature.
+
+    cd tasks-api && python benchmarks/bench_token_algorithms.py --iterations 5000
+
+Compare HS256 (secret partagé) aux algorithmes asymétriques vérifiables via le JWKS
+(ES256, EdDSA, et RS256 pour référence), pour chaque backend qui les implémente.
+La vérification asymétrique est plus chère que HMAC : c'est ce coût que le cache
+des jetons vérifiés (token_cache.py) amortit.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa  # noqa: E402
+
+from tokens import available_backends, get_backend  # noqa: E402
+
+SECRET = "s" * 32
+
+
+def asymmetric_keys(algorithm: str):
+    """(clé privée PEM, clé publique PEM) pour l'algorithme."""
+    if algorithm == "RS256":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+def ops_per_second(function, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return iterations / (time.perf_counter() - start)
+
+
+def main(iterations: int):
+    claims = {"sub": "bench-user", "exp": int(time.time()) + 1800}
+    keys = {"HS256": (SECRET, SECRET)}
+    for algorithm in ("ES256", "EdDSA", "RS256"):
+        keys[algorithm] = asymmetric_keys(algorithm)
+
+    print(f"{'backend':<8} {'algorithm':<9} {'sign ops/s':>12} {'verify ops/s':>13} {'µs / verify':>12}")
+    for name in available_backends():
+        backend = get_backend(name)
+        for algorithm, (signing_key, verifying_key) in keys.items():
+            if algorithm not in backend.algorithms:
+                print(f"{name:<8} {algorithm:<9} {'unsupported':>12}")
+                continue
+            token = backend.encode(claims, signing_key, algorithm)
+            assert backend.decode(token, verifying_key, [algorithm]) == claims
+            sign_ops = ops_per_second(lambda: backend.encode(claims, signing_key, algorithm), iterations)
+            verify_ops = ops_per_second(lambda: backend.decode(token, verifying_key, [algorithm]), iterations)
+            print(f"{name:<8} {algorithm:<9} {sign_ops:>12,.0f} {verify_ops:>13,.0f} {1e6 / verify_ops:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+    main(args.iterations)
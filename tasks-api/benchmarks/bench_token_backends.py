@@ -0,0 +1,72 @@
+"""
+Benchmark comparatif des backends JWT (voir tokens.py) : signature et vérification.
+
+    cd tasks-api && python benchmarks/bench_token_backends.py --iterations 20000
+
+Pour chaque backend disponible, affiche le débit (ops/s) de encode et decode, et la
+mémoire allouée par appel, mesurée avec tracemalloc (pic transitoire, en octets).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tokens import available_backends, get_backend  # noqa: E402
+
+SECRET = os.getenv("JWT_SECRET_KEY", "un_secret_tres_fort_a_changer")
+ALGORITHM = "HS256"
+
+
+def ops_per_second(function, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return iterations / (time.perf_counter() - start)
+
+
+def allocated_bytes(function, samples: int = 200) -> float:
+    """Pic d'allocation transitoire par appel (octets), moyenné sur `samples` appels."""
+    function()  # caches internes chauds
+    tracemalloc.start()
+    total = 0
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        function()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / samples
+
+
+def main(iterations: int):
+    claims = {"sub": "bench-user", "exp": int(time.time()) + 1800}
+    print(f"{'backend':<8} {'sign ops/s':>12} {'verify ops/s':>13} {'sign peak B':>12} {'verify peak B':>14}")
+    for name in available_backends():
+        backend = get_backend(name)
+        token = backend.encode(claims, SECRET, ALGORITHM)
+
+        def sign():
+            return backend.encode(claims, SECRET, ALGORITHM)
+
+        def verify():
+            return backend.decode(token, SECRET, [ALGORITHM])
+
+        assert verify() == claims, f"{name} does not round-trip claims"
+        sign_ops = ops_per_second(sign, iterations)
+        verify_ops = ops_per_second(verify, iterations)
+        sign_peak = allocated_bytes(sign)
+        verify_peak = allocated_bytes(verify)
+        print(f"{name:<8} {sign_ops:>12,.0f} {verify_ops:>13,.0f} {sign_peak:>12,.0f} {verify_peak:>14,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    # PyJWT avertit sur les secrets HMAC courts (comme la valeur par défaut) : sans effet sur la mesure
+    warnings.simplefilter("ignore")
+    main(args.iterations)
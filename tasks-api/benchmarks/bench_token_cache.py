@@ -0,0 +1,52 @@
+"""
+Microbenchmark : coût CPU de get_current_user avec et sans le cache de jetons vérifiés.
+
+    cd tasks-api && python benchmarks/bench_token_cache.py --iterations 20000
+
+Mesure le temps CPU (process_time) par appel pour un jeton décodé à chaque fois
+(jwt.decode) et pour un jeton servi par le cache (SHA-256 + lookup LRU).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from jose import jwt  # noqa: E402
+
+import app as tasks_app  # noqa: E402
+from token_cache import token_cache  # noqa: E402
+
+
+def measure(label: str, iterations: int, before_each=None) -> float:
+    token = jwt.encode(
+        {"sub": "bench-user", "exp": datetime.utcnow() + timedelta(minutes=30)},
+        tasks_app.SECRET_KEY, algorithm=tasks_app.ALGORITHM,
+    )
+
+    async def loop():
+        for _ in range(iterations):
+            if before_each is not None:
+                before_each()
+            await tasks_app.get_current_user(token)
+
+    start = time.process_time()
+    asyncio.run(loop())
+    per_call = (time.process_time() - start) / iterations * 1e6
+    print(f"{label:<28} {per_call:8.2f} µs CPU / request")
+    return per_call
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    uncached = measure("jwt.decode every request", args.iterations, before_each=token_cache.clear)
+    token_cache.clear()
+    cached = measure("verified-token cache hit", args.iterations)
+    print(f"{'saved':<28} {uncached - cached:8.2f} µs CPU / request ({uncached / cached:.1f}x)")
+    print(f"cache hit ratio: {token_cache.hit_ratio():.3f}")
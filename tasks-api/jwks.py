@@ -0,0 +1,89 @@
+"""
+Clés publiques de vérification des jetons, lues depuis le JWKS d'auth-api.
+
+Avec JWKS_URL défini (ex. http://auth-api:8000/.well-known/jwks.json), tasks-api
+vérifie les jetons ES256/EdDSA localement : aucun secret partagé, et le JWKS n'est
+relu qu'à l'expiration du TTL (JWKS_TTL, défaut 300 s) ou quand un jeton présente
+un `kid` inconnu (rotation de clé). Ce second cas est limité à une relecture toutes
+les JWKS_MIN_REFRESH secondes (défaut 10) pour qu'un flot de jetons forgés ne
+transforme pas chaque requête en appel à auth-api. En cas d'échec de lecture, les
+clés déjà connues restent utilisées.
+"""
+import os
+import threading
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import Counter, Gauge
+from tokens import TokenError
+
+REFRESHES = Counter("jwks_refreshes_total", "JWKS fetches from auth-api.", ("result",))
+KEYS = Gauge("jwks_keys", "Verification keys currently known from the JWKS.")
+
+JWKS_TTL = float(os.getenv("JWKS_TTL", "300"))
+JWKS_MIN_REFRESH = float(os.getenv("JWKS_MIN_REFRESH", "10"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "5"))
+
+
+class JWKSCache:
+    def __init__(self, url: str, backend, ttl: float = JWKS_TTL, min_refresh: float = JWKS_MIN_REFRESH):
+        self.url = url
+        self.backend = backend
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._keys = {}  # kid -> (algorithm, clé de vérification)
+        self._fetched_at = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        KEYS.set_function(lambda: len(self._keys))
+
+    def load(self, document: dict):
+        """Remplace les clés connues par celles du document JWKS (clés non prises en charge ignorées)."""
+        keys = {}
+        for jwk in document.get("keys", []):
+            kid, algorithm = jwk.get("kid"), jwk.get("alg")
+            if not kid or algorithm not in self.backend.algorithms:
+                continue
+            try:
+                keys[kid] = (algorithm, self.backend.key_from_jwk(jwk))
+            except TokenError as e:
+                print(f"Ignoring JWKS key {kid}: {e}")
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def needs_refresh(self, kid: str | None) -> bool:
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        if self._fetched_at is None:
+            return True
+        age = now - self._fetched_at
+        return age >= self.ttl or (kid not in self._keys and age >= self.min_refresh)
+
+    def refresh(self, kid: str | None = None):
+        """Relit le JWKS (bloquant) ; un seul appel à la fois, les autres réutilisent son résultat."""
+        import httpx
+        with self._lock:
+            if not self.needs_refresh(kid):
+                return
+            try:
+                response = httpx.get(self.url, timeout=JWKS_TIMEOUT)
+                response.raise_for_status()
+                self.load(response.json())
+                REFRESHES.labels("ok").inc()
+            except Exception as e:
+                # On garde les clés connues et on ne réessaie qu'après min_refresh
+                self._retry_at = time.monotonic() + self.min_refresh
+                REFRESHES.labels("error").inc()
+                print(f"JWKS refresh from {self.url} failed: {e}")
+
+    async def resolve(self, token: str):
+        """(algorithme, clé) pour vérifier `token`, d'après le `kid` de son en-tête."""
+        kid = self.backend.get_unverified_header(token).get("kid")
+        if self.needs_refresh(kid):
+            await run_in_threadpool(self.refresh, kid)
+        entry = self._keys.get(kid)
+        if entry is None:
+            raise TokenError(f"Unknown signing key {kid!r}")
+        return entry
@@ -0,0 +1,225 @@
+"""
+Métriques au format texte Prometheus, sans dépendance externe.
+
+    REQUESTS.labels("GET", "/tasks/{task_id}", "200").inc()
+    render()  ->  contenu de GET /metrics
+
+Les requêtes HTTP sont étiquetées par *gabarit* de route (/tasks/{task_id}) et
+non par chemin brut : le nombre de séries reste borné par le nombre de routes.
+"""
+import bisect
+import threading
+import time
+
+from starlette.responses import Response
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), register=True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def clear(self):
+        with self._lock:
+            self._children = {}
+
+    def _default(self):
+        return self.labels()
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self.function = None
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function):
+        """La valeur est lue à chaque collecte (ex. connexions en cours dans le pool)."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_number(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernière case : +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def cumulative(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        result, running = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            result.append((bound, running))
+        return result, total
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS, register=True):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, register)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _render_child(self, values, child):
+        buckets, total = child.cumulative()
+        lines = []
+        for bound, count in buckets:
+            le = 'le="%s"' % _format_number(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, [le])} {count}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+        lines.append(f"{self.name}_count{labels} {buckets[-1][1]}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response() -> Response:
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
+# --- Métriques HTTP ---
+REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being handled.")
+LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : compte, mesure et étiquette chaque requête par gabarit de route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = IN_PROGRESS.labels()
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            # Le routeur Starlette place la route trouvée dans le scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            labels = (scope["method"], route, status_code)
+            REQUESTS.labels(*labels).inc()
+            LATENCY.labels(*labels).observe(elapsed)
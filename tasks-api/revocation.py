@@ -0,0 +1,182 @@
+"""
+Révocation des jetons avant leur `exp`, vérifiée localement à chaque requête.
+
+auth-api enregistre les révocations (POST /logout : un `jti`, POST /logout-all : tous
+les jetons d'un utilisateur émis avant un instant) et les publie sur GET /revocations,
+lu de façon incrémentale (`?since=<curseur>`). tasks-api en garde une copie en mémoire :
+
+- un filtre de Bloom des `jti` révoqués, qui répond « non révoqué » au cas courant
+  sans toucher à l'ensemble exact ;
+- l'ensemble exact des `jti`, consulté seulement quand le filtre répond « peut-être »
+  (élimine les faux positifs) ;
+- les coupures par utilisateur (`iat < not_before` : révoqué ; les deux avec fraction
+  de seconde, un jeton émis juste après /logout-all reste valide).
+
+La vérification coûte quelques microsecondes et aucun aller-retour réseau ou SQL.
+RevocationSync interroge auth-api toutes les REVOCATION_POLL_INTERVAL secondes
+(défaut 5), et relit tout le flux toutes les REVOCATION_RESYNC_INTERVAL secondes
+(défaut 300) : la relecture complète reconstruit le filtre (qui ne sait pas retirer
+un élément) sans les révocations expirées, et rattrape une révocation dont l'id aurait
+été validé après une lecture incrémentale. Si auth-api est injoignable, les
+révocations déjà connues restent appliquées ; `revocation_sync_age_seconds` mesure
+le retard.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+
+from metrics import Counter, Gauge
+
+SYNCS = Counter("revocation_syncs_total", "Revocation feed reads from auth-api.", ("kind", "result"))
+REVOKED = Gauge("revocation_revoked_tokens", "Revoked token ids (jti) known locally.")
+CUTOFFS = Gauge("revocation_user_cutoffs", "Users with a revoke-all cutoff known locally.")
+SYNC_AGE = Gauge("revocation_sync_age_seconds", "Seconds since the last successful revocation sync.")
+
+REVOCATIONS_URL = os.getenv("REVOCATIONS_URL")
+REVOCATION_FEED_KEY = os.getenv("REVOCATION_FEED_KEY")
+REVOCATION_POLL_INTERVAL = float(os.getenv("REVOCATION_POLL_INTERVAL", "5"))
+REVOCATION_RESYNC_INTERVAL = float(os.getenv("REVOCATION_RESYNC_INTERVAL", "300"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "10000"))
+
+
+class BloomFilter:
+    """Filtre de Bloom à taux de faux positifs `error_rate` jusqu'à `capacity` éléments."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)), 64)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hachage (Kirsch–Mitzenmacher) à partir d'un seul condensat
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.clear()
+        REVOKED.set_function(lambda: len(self._jtis))
+        CUTOFFS.set_function(lambda: len(self._cutoffs))
+
+    def clear(self):
+        self._bloom = BloomFilter(self.capacity)
+        self._jtis = {}  # jti -> exp
+        self._cutoffs = {}  # sub -> not_before
+        self.cursor = 0
+        self.synced_at = None
+
+    def is_revoked(self, claims: dict) -> bool:
+        jti = claims.get("jti")
+        if jti is not None and jti in self._bloom and jti in self._jtis:
+            return True
+        cutoff = self._cutoffs.get(claims.get("sub"))
+        return cutoff is not None and claims.get("iat", 0) < cutoff
+
+    def apply(self, entries: list[dict], cursor: int, full: bool = False):
+        """Ajoute les révocations lues depuis auth-api ; `full` remplace tout l'état."""
+        with self._lock:
+            jtis = {} if full else self._jtis
+            cutoffs = {} if full else self._cutoffs
+            for entry in entries:
+                if entry.get("jti"):
+                    jtis[entry["jti"]] = entry["exp"]
+                if entry.get("not_before") is not None:
+                    sub = entry["sub"]
+                    cutoffs[sub] = max(cutoffs.get(sub, 0), entry["not_before"])
+            if full or len(jtis) > self._bloom.capacity:
+                bloom = BloomFilter(max(self.capacity, 2 * len(jtis)))
+                for jti in jtis:
+                    bloom.add(jti)
+                # Remplacement atomique : les lecteurs ne prennent pas le verrou
+                self._bloom, self._jtis, self._cutoffs = bloom, jtis, cutoffs
+            else:
+                # L'ensemble exact est déjà à jour ; le filtre suit (un lecteur qui passe
+                # entre les deux voit au pire « non révoqué », comme avant la lecture)
+                for entry in entries:
+                    if entry.get("jti"):
+                        self._bloom.add(entry["jti"])
+            self.cursor = cursor
+            self.synced_at = time.monotonic()
+
+
+class RevocationSync:
+    """Thread qui recopie le flux GET /revocations d'auth-api dans une RevocationList."""
+
+    def __init__(self, revocations: RevocationList, url: str, poll_interval: float = REVOCATION_POLL_INTERVAL,
+                 resync_interval: float = REVOCATION_RESYNC_INTERVAL, feed_key: str | None = REVOCATION_FEED_KEY):
+        self.revocations = revocations
+        self.url = url
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.feed_key = feed_key
+        self._stop = threading.Event()
+        self._thread = None
+        SYNC_AGE.set_function(self.sync_age)
+
+    def sync_age(self) -> float:
+        synced_at = self.revocations.synced_at
+        return time.monotonic() - synced_at if synced_at is not None else float("inf")
+
+    def fetch(self, since: int):
+        """Toutes les révocations après `since` (en suivant la pagination) et le nouveau curseur."""
+        import httpx
+        headers = {"X-Revocation-Key": self.feed_key} if self.feed_key else {}
+        entries = []
+        while True:
+            response = httpx.get(self.url, params={"since": since}, headers=headers, timeout=5)
+            response.raise_for_status()
+            page = response.json()
+            entries.extend(page["revocations"])
+            since = page["cursor"]
+            if not page["more"]:
+                return entries, since
+
+    def sync(self, full: bool = False):
+        kind = "full" if full else "incremental"
+        try:
+            entries, cursor = self.fetch(0 if full else self.revocations.cursor)
+        except Exception:
+            SYNCS.labels(kind, "error").inc()
+            raise
+        self.revocations.apply(entries, cursor, full=full)
+        SYNCS.labels(kind, "ok").inc()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def _run(self):
+        next_full = 0.0
+        while not self._stop.is_set():
+            full = time.monotonic() >= next_full
+            try:
+                self.sync(full=full)
+                if full:
+                    next_full = time.monotonic() + self.resync_interval
+            except Exception as e:
+                print(f"Revocation sync from {self.url} failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+
+revocations = RevocationList()
@@ -0,0 +1,155 @@
+"""
+Instrumentation SQL par requête HTTP (événements before/after_cursor_execute et
+handle_error pour les requêtes en échec).
+
+Pour chaque requête HTTP, on compte les requêtes SQL et le temps passé en base :
+
+- en-tête de réponse  Server-Timing: db;dur=3.21;desc="2 queries"
+- métriques /metrics   db_queries_per_request, db_time_per_request_seconds (par route)
+- log "slow query"     au-delà de SLOW_QUERY_MS (défaut 200 ms), avec le texte SQL et
+                       la *forme* des paramètres (types), jamais leurs valeurs.
+- log "failed query"   pour toute requête en erreur (timeout, contrainte...), comptée
+                       et chronométrée comme les autres, plus db_query_errors_total.
+
+L'instant de départ est porté par le contexte d'exécution (un par requête SQL), pas par
+la connexion du pool : une requête en échec ne laisse rien derrière elle.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from metrics import Counter, Histogram, UNMATCHED_ROUTE
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+logger = logging.getLogger("sql.slow")
+
+QUERIES = Counter("db_queries_total", "SQL statements executed.", ("verb",))
+QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised.", ("verb",))
+QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement latency.", ("verb",))
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per HTTP request.", ("route",)
+)
+
+
+class RequestSQLStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Partagé par copie de contexte avec le pool de threads et les greenlets de run_sync
+_current = ContextVar("request_sql_stats", default=None)
+
+
+def current_stats() -> RequestSQLStats | None:
+    return _current.get()
+
+
+def parameters_shape(parameters):
+    """Types des paramètres, sans leurs valeurs (qui peuvent être sensibles)."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} x {parameters_shape(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_timing_start = time.perf_counter()
+
+
+def _record(statement, parameters, context, error=None):
+    start = getattr(context, "_sql_timing_start", None)
+    if start is None:
+        return
+    del context._sql_timing_start
+    elapsed = time.perf_counter() - start
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement and statement.strip() else "OTHER"
+    QUERIES.labels(verb).inc()
+    QUERY_DURATION.labels(verb).observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+    if error is not None:
+        QUERY_ERRORS.labels(verb).inc()
+        logger.warning(
+            "failed query (%.1f ms, %s): %s | params: %s",
+            elapsed * 1000, type(error).__name__, " ".join(statement.split()), parameters_shape(parameters),
+        )
+    elif elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query (%.1f ms): %s | params: %s",
+            elapsed * 1000, " ".join(statement.split()), parameters_shape(parameters),
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(statement, parameters, context)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute n'est pas appelé quand l'exécution lève
+    _record(
+        exception_context.statement,
+        exception_context.parameters,
+        exception_context.execution_context,
+        exception_context.original_exception,
+    )
+
+
+def instrument_engine(engine):
+    """Branche les événements sur un moteur synchrone ou asynchrone (idempotent)."""
+    target = getattr(engine, "sync_engine", engine)
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+    return engine
+
+
+class SQLTimingMiddleware:
+    """Middleware ASGI : agrège les requêtes SQL de chaque requête HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and stats.count:
+                header = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.duration)
@@ -0,0 +1,221 @@
+"""
+Cache en mémoire (par processus) des pages de GET /tasks, par propriétaire.
+
+- LRU borné en octets (TASKS_CACHE_MAX_BYTES, défaut 16 Mio : largement sous la
+  limite mémoire de 256Mi du conteneur) et expiration (TASKS_CACHE_TTL, défaut 60 s,
+  0 = cache désactivé).
+- Les valeurs sont les corps JSON déjà sérialisés : un hit ne touche ni la base
+  ni Pydantic.
+- Chaque écriture invalide les pages de son propriétaire. Un numéro de génération
+  par propriétaire empêche une lecture commencée avant l'écriture de remettre en
+  cache une page périmée.
+
+Cohérence entre réplicas (PostgreSQL) : un trigger sur `tasks` publie le
+propriétaire modifié via pg_notify sur le canal NOTIFY_CHANNEL, dans la transaction
+de l'écriture (livré au commit). Chaque worker garde une connexion LISTEN
+(InvalidationListener) qui invalide les entrées correspondantes.
+
+Borne de fraîcheur : en régime normal, une entrée d'un autre réplica est périmée au
+plus le temps de livraison de la notification (quelques ms après le commit). Si la
+connexion LISTEN tombe, le cache est suspendu (tout est lu en base) jusqu'au
+réabonnement, puis vidé : les notifications perdues ne peuvent pas servir de données
+périmées. Une coupure silencieuse est détectée par un ping toutes les
+TASKS_CACHE_HEARTBEAT secondes (défaut 5) : c'est la borne dans le pire cas, elle-même
+plafonnée par TASKS_CACHE_TTL.
+"""
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+# Surcoût approximatif d'une entrée (clé, tuple, en-têtes) en plus du corps
+ENTRY_OVERHEAD_BYTES = 256
+# Au-delà, les générations sont purgées (et l'époque globale avancée par sécurité)
+MAX_TRACKED_GENERATIONS = 100_000
+
+HITS = Counter("task_cache_hits_total", "Task list cache hits.")
+MISSES = Counter("task_cache_misses_total", "Task list cache misses.")
+EVICTIONS = Counter("task_cache_evictions_total", "Task list cache entries evicted.", ("reason",))
+SIZE_BYTES = Gauge("task_cache_bytes", "Approximate memory used by the task list cache.")
+ENTRIES = Gauge("task_cache_entries", "Entries in the task list cache.")
+SUSPENDED = Gauge("task_cache_suspended", "1 while the cache is bypassed (invalidation listener down).")
+NOTIFICATIONS = Counter("task_cache_notifications_total", "Invalidations received through LISTEN/NOTIFY.")
+RESUBSCRIBES = Counter("task_cache_listener_reconnects_total", "Reconnections of the LISTEN connection.")
+
+NOTIFY_CHANNEL = "tasks_invalidate"
+# Heartbeat de la connexion LISTEN (voir la borne de fraîcheur ci-dessus)
+LISTENER_HEARTBEAT = float(os.getenv("TASKS_CACHE_HEARTBEAT", "5"))
+
+
+class TaskListCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (owner, key) -> (expires_at, size, value)
+        self._owner_keys = {}          # owner -> set(key)
+        self._generations = {}         # owner -> int
+        self._epoch = 0
+        self._bytes = 0
+        self.suspended = False
+        SIZE_BYTES.set_function(lambda: self._bytes)
+        ENTRIES.set_function(lambda: len(self._entries))
+        SUSPENDED.set_function(lambda: int(self.suspended))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_bytes > 0 and not self.suspended
+
+    def suspend(self):
+        """Contourne le cache tant que les invalidations des autres réplicas ne sont plus reçues."""
+        self.suspended = True
+        self.clear()
+
+    def resume(self):
+        self.clear()
+        self.suspended = False
+
+    def generation(self, owner: str):
+        """À lire *avant* d'interroger la base, puis à repasser à put()."""
+        with self._lock:
+            return (self._epoch, self._generations.get(owner, 0))
+
+    def get(self, owner: str, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get((owner, key))
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove((owner, key))
+                EVICTIONS.labels("expired").inc()
+                entry = None
+            if entry is None:
+                MISSES.inc()
+                return None
+            self._entries.move_to_end((owner, key))
+        HITS.inc()
+        return entry[2]
+
+    def put(self, owner: str, key, value, body_size: int, generation):
+        if not self.enabled:
+            return
+        size = body_size + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(owner, 0)):
+                return  # une écriture a eu lieu pendant la lecture
+            self._remove((owner, key))
+            self._entries[(owner, key)] = (time.monotonic() + self.ttl, size, value)
+            self._owner_keys.setdefault(owner, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                EVICTIONS.labels("size").inc()
+
+    def invalidate(self, owner: str):
+        with self._lock:
+            if len(self._generations) >= MAX_TRACKED_GENERATIONS:
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+            for key in list(self._owner_keys.get(owner, ())):
+                self._remove((owner, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owner_keys.clear()
+            self._generations.clear()
+            self._epoch += 1
+            self._bytes = 0
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        owner, key = cache_key
+        keys = self._owner_keys.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._owner_keys[owner]
+
+
+class InvalidationListener:
+    """
+    Thread qui écoute NOTIFY_CHANNEL sur une connexion psycopg2 dédiée et invalide
+    le cache local. Se réabonne automatiquement (backoff exponentiel) après une coupure.
+    """
+
+    def __init__(self, cache: TaskListCache, dsn: str, heartbeat: float = 5.0, max_backoff: float = 30.0):
+        self.cache = cache
+        self.dsn = dsn
+        self.heartbeat = heartbeat
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.cache.suspend()
+        self._thread = threading.Thread(target=self._run, name="task-cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat + 1)
+
+    def _run(self):
+        import psycopg2  # pilote synchrone, aussi utilisé en mode asyncpg pour cette connexion
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Abonné : on repart d'un cache vide (des notifications ont pu être perdues)
+                self.cache.resume()
+                backoff = 1.0
+                self._listen(conn)
+            except Exception as e:
+                print(f"Task cache listener disconnected: {e}")
+            finally:
+                self.cache.suspend()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+            RESUBSCRIBES.inc()
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.heartbeat) == ([], [], []):
+                # Rien reçu : on vérifie que la connexion est toujours vivante
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            conn.poll()
+            self.dispatch(conn)
+
+    def dispatch(self, conn):
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            NOTIFICATIONS.inc()
+            self.cache.invalidate(notify.payload)
+
+
+task_cache = TaskListCache(
+    max_bytes=int(os.getenv("TASKS_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("TASKS_CACHE_TTL", "60")),
+)
@@ -0,0 +1,57 @@
+"""
+Sérialisation JSON des tâches sans validation Pydantic ligne par ligne.
+
+Les colonnes lues en base ont déjà les types de TaskOut (Integer, String, Boolean) :
+repasser chaque ligne par TaskOut (validate_python(..., from_attributes=True) puis
+dump_json) coûte plus cher que la requête SQL sur les grandes pages. Ici, chaque
+ligne — objet ORM ou Row de select(*TASK_COLUMNS) — devient directement un dict dans
+l'ordre des champs de TaskOut, encodé en une fois par orjson s'il est installé, sinon
+par pydantic_core.to_json. Les deux produisent exactement les octets de
+TypeAdapter(list[TaskOut]).dump_json (JSON compact, UTF-8 non échappé), ce que
+vérifie test_task_json_matches_pydantic.
+
+title, completed et owner restent nullables dans le schéma, et TaskOut refuse None :
+une ligne qui contient un NULL est repassée par TaskOut, qui lève la même
+ValidationError qu'avant au lieu d'émettre un `null` que le modèle n'autorise pas.
+"""
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : repli sur l'encodeur de pydantic
+    orjson = None
+
+# Ordre des clés de TaskOut ; vérifié au démarrage par check_fields
+TASK_FIELDS = ("id", "title", "completed", "owner")
+_model = None
+
+
+def check_fields(model):
+    """Vérifie l'ordre des champs et retient le modèle qui valide les lignes contenant un NULL."""
+    global _model
+    if tuple(model.model_fields) != TASK_FIELDS:
+        raise RuntimeError(f"task_json.TASK_FIELDS {TASK_FIELDS} does not match {model.__name__}")
+    _model = model
+
+
+def _dumps_pydantic(value) -> bytes:
+    return to_json(value)
+
+
+dumps = orjson.dumps if orjson is not None else _dumps_pydantic
+
+
+def task_dict(row) -> dict:
+    task = {"id": row.id, "title": row.title, "completed": row.completed, "owner": row.owner}
+    if None in task.values():
+        # Colonne NULL : TaskOut lève sa ValidationError, comme sur le chemin Pydantic
+        return _model.model_validate(row, from_attributes=True).model_dump()
+    return task
+
+
+def dump_task(row) -> bytes:
+    return dumps(task_dict(row))
+
+
+def dump_tasks(rows) -> bytes:
+    return dumps([task_dict(row) for row in rows])
@@ -3,6 +3,8 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app import app, get_db, Base, get_current_user # Assurez-vous que le nom d'import est correct
+from task_cache import task_cache
+from jose import jwt
 
 # --- Configuration de la base de données de test ---
 # Nous utilisons une base de données SQLite en mémoire pour les tests
@@ -52,6 +54,9 @@ def test_client(db_session):
 
     app.dependency_overrides[get_db] = override_get_db
     app.dependency_overrides[get_current_user] = override_get_current_user
+
+    # Le cache de liste est global au processus : chaque test repart d'un cache vide
+    task_cache.clear()
     
     client = TestClient(app)
     yield client
@@ -192,3 +197,696 @@ def test_update_task_not_owner(test_client, db_session):
     response = test_client.put(f"/tasks/{db_task.id}", json=update_data)
     assert response.status_code == 403
     assert response.json() == {"detail": "Not authorized to update this task"}
+
+# --- Pagination par curseur ---
+def test_read_tasks_paginated(test_client, db_session):
+    """Teste le parcours de la liste page par page avec le curseur."""
+    from app import Task
+    for i in range(5):
+        db_session.add(Task(title=f"Task {i}", owner="testuser", completed=False))
+    db_session.add(Task(title="Other User Task", owner="anotheruser", completed=False))
+    db_session.commit()
+
+    response = test_client.get("/tasks", params={"limit": 2})
+    assert response.status_code == 200
+    assert [t["title"] for t in response.json()] == ["Task 0", "Task 1"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = test_client.get("/tasks", params={"limit": 2, "after": cursor})
+    assert [t["title"] for t in response.json()] == ["Task 2", "Task 3"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = test_client.get("/tasks", params={"limit": 2, "after": cursor})
+    assert [t["title"] for t in response.json()] == ["Task 4"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_read_tasks_streaming(test_client, db_session, monkeypatch):
+    """Teste les modes streaming (NDJSON et tableau JSON fragmenté) : même contenu que la liste paginée."""
+    import json
+    import app as tasks_app
+    from app import Task, encode_cursor
+    monkeypatch.setattr(tasks_app, "STREAM_BATCH_SIZE", 2)
+    assert test_client.get("/tasks", params={"stream": "true"}).json() == []
+    for i in range(5):
+        db_session.add(Task(title=f"Task {i}", owner="testuser", completed=False))
+    db_session.add(Task(title="Other User Task", owner="anotheruser", completed=False))
+    db_session.commit()
+    expected = test_client.get("/tasks").json()
+
+    response = test_client.get("/tasks", headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+    response = test_client.get("/tasks", params={"stream": "true"})
+    assert response.headers["content-type"] == "application/json"
+    assert "content-length" not in response.headers
+    assert response.json() == expected
+
+    response = test_client.get("/tasks", params={"stream": "true", "after": encode_cursor(expected[2]["id"])})
+    assert response.json() == expected[3:]
+
+def test_task_json_matches_pydantic(test_client, db_session, monkeypatch):
+    """Teste que la sérialisation rapide (orjson ou repli pydantic_core) produit les octets de TaskOut."""
+    import task_json
+    from app import Task, TaskOut, TASK_LIST
+    titles = ["plain", "accents éàü", "emoji 🚀", 'quotes "\\ /', "control \x00\x01\x1f\x7f\n\t", "  ", ""]
+    for i, title in enumerate(titles):
+        db_session.add(Task(title=title, owner="testuser", completed=i % 2 == 0))
+    db_session.commit()
+    rows = db_session.query(Task).order_by(Task.id).all()
+    expected = TASK_LIST.dump_json(TASK_LIST.validate_python(rows, from_attributes=True))
+
+    assert task_json.dump_tasks(rows) == expected
+    monkeypatch.setattr(task_json, "dumps", task_json._dumps_pydantic)
+    assert task_json.dump_tasks(rows) == expected
+    assert test_client.get("/tasks").content == expected
+    assert test_client.get(f"/tasks/{rows[4].id}").content == TaskOut.model_validate(rows[4]).model_dump_json().encode()
+
+def test_task_json_rejects_null_columns(db_session):
+    """Teste qu'une colonne NULL (le schéma l'autorise) lève la ValidationError de TaskOut au lieu d'émettre null."""
+    import task_json
+    from pydantic import ValidationError
+    from app import Task, db_list_tasks
+    db_session.add(Task(title=None, owner="testuser", completed=False))
+    db_session.commit()
+    rows = db_list_tasks(db_session, "testuser", None, 10)
+    with pytest.raises(ValidationError):
+        task_json.dump_tasks(rows)
+    with pytest.raises(ValidationError):
+        task_json.dump_task(rows[0])
+
+def test_read_paths_skip_identity_map(test_client, db_session):
+    """Teste que les lectures renvoient des Row Core, sans charger d'objets dans la session."""
+    from app import Task, db_list_tasks, db_read_task
+    for i in range(3):
+        db_session.add(Task(title=f"Task {i}", owner="testuser", completed=False))
+    db_session.commit()
+    db_session.expunge_all()
+
+    rows = db_list_tasks(db_session, "testuser", None, 2)
+    assert [row.title for row in rows] == ["Task 0", "Task 1"]
+    assert [row.title for row in db_list_tasks(db_session, "testuser", rows[-1].id, 2)] == ["Task 2"]
+    assert db_read_task(db_session, "testuser", rows[0].id) == rows[0]
+    assert not isinstance(rows[0], Task)
+    assert len(db_session.identity_map) == 0
+
+def test_read_tasks_invalid_cursor(test_client):
+    """Teste qu'un curseur invalide est rejeté."""
+    response = test_client.get("/tasks", params={"after": "pas-un-curseur"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+# --- Création en masse ---
+def test_create_tasks_bulk(test_client, db_session):
+    """Teste la création de plusieurs tâches en une requête."""
+    from app import Task
+    response = test_client.post("/tasks/bulk", json=[{"title": "Bulk 1"}, {"title": "Bulk 2"}])
+    assert response.status_code == 201
+    data = response.json()
+    assert [t["title"] for t in data] == ["Bulk 1", "Bulk 2"]
+    assert all(t["owner"] == "testuser" and t["completed"] == False for t in data)
+    assert db_session.query(Task).filter(Task.owner == "testuser").count() == 2
+
+def test_create_tasks_bulk_too_many(test_client, monkeypatch):
+    """Teste que la taille du lot est plafonnée."""
+    import app as tasks_app
+    monkeypatch.setattr(tasks_app, "BULK_MAX_ITEMS", 2)
+    response = test_client.post("/tasks/bulk", json=[{"title": "t"}] * 3)
+    assert response.status_code == 413
+
+# --- Mise à jour et suppression en masse ---
+def test_update_tasks_bulk(test_client, db_session):
+    """Teste la mise à jour en masse par IDs, sans toucher aux tâches des autres."""
+    from app import Task
+    mine = Task(title="Mine", owner="testuser", completed=False)
+    other = Task(title="Other User Task", owner="anotheruser", completed=False)
+    db_session.add_all([mine, other])
+    db_session.commit()
+
+    response = test_client.patch("/tasks/bulk", json={
+        "ids": [mine.id, other.id, 999],
+        "changes": {"completed": True},
+    })
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"id": mine.id, "status": "updated"},
+        {"id": other.id, "status": "not_found"},
+        {"id": 999, "status": "not_found"},
+    ]}
+    assert db_session.get(Task, mine.id).completed == True
+    assert db_session.get(Task, other.id).completed == False
+
+def test_delete_tasks_bulk_completed(test_client, db_session):
+    """Teste la suppression de toutes les tâches terminées en une requête."""
+    from app import Task
+    done = Task(title="Done", owner="testuser", completed=True)
+    todo = Task(title="Todo", owner="testuser", completed=False)
+    other = Task(title="Other User Task", owner="anotheruser", completed=True)
+    db_session.add_all([done, todo, other])
+    db_session.commit()
+    done_id = done.id
+
+    response = test_client.request("DELETE", "/tasks/bulk", json={"completed": True})
+    assert response.status_code == 200
+    assert response.json() == {"results": [{"id": done_id, "status": "deleted"}]}
+    remaining = {t.title for t in db_session.query(Task).all()}
+    assert remaining == {"Todo", "Other User Task"}
+
+def test_delete_tasks_bulk_requires_selection(test_client):
+    """Teste qu'une suppression en masse sans critère est refusée."""
+    response = test_client.request("DELETE", "/tasks/bulk", json={})
+    assert response.status_code == 422
+
+# --- Écritures en une seule requête ---
+def test_write_paths_single_statement(test_client, db_session):
+    """Teste que création, mise à jour et suppression n'émettent qu'une requête SQL chacune (plus la version)."""
+    from sqlalchemy import event
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        task_id = test_client.post("/tasks", json={"title": "One"}).json()["id"]
+        test_client.put(f"/tasks/{task_id}", json={"title": "Two", "completed": True})
+        test_client.delete(f"/tasks/{task_id}")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    verbs = [s.split()[0].upper() for s in statements if not s.upper().startswith(("SAVEPOINT", "RELEASE"))]
+    # Chaque écriture commence par l'upsert de task_versions, dans la même transaction ;
+    # la suppression enregistre sa pierre tombale et purge les anciennes
+    assert verbs == ["INSERT", "INSERT", "INSERT", "UPDATE", "INSERT", "DELETE", "INSERT", "DELETE"]
+
+def test_conditional_get(test_client, db_session):
+    """Teste ETag / If-None-Match : 304 tant que rien n'a changé, sans lire la table tasks pour la liste."""
+    from sqlalchemy import event
+    task_id = test_client.post("/tasks", json={"title": "Cached"}).json()["id"]
+    for url in ("/tasks", f"/tasks/{task_id}"):
+        response = test_client.get(url)
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"] == "private, no-cache"
+
+        task_cache.clear()
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = test_client.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        if url == "/tasks":
+            assert not any("FROM tasks" in s for s in statements)
+
+        test_client.put(f"/tasks/{task_id}", json={"title": "Changed", "completed": False})
+        response = test_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    # Un ETag valide ne donne jamais 304 pour une tâche absente ou d'un autre utilisateur
+    from app import Task, task_etag, db_owner_version
+    foreign = Task(title="Foreign", owner="anotheruser", completed=False)
+    db_session.add(foreign)
+    db_session.commit()
+    version = db_owner_version(db_session, "testuser")
+    response = test_client.get(f"/tasks/{foreign.id}", headers={"If-None-Match": task_etag(version, f"t{foreign.id}")})
+    assert response.status_code == 403
+    response = test_client.get("/tasks/999999", headers={"If-None-Match": task_etag(version, "t999999")})
+    assert response.status_code == 404
+
+    # Les écritures d'un autre utilisateur ne changent pas la version
+    etag = test_client.get("/tasks").headers["etag"]
+    from app import bump_version
+    bump_version(db_session, "anotheruser")
+    db_session.commit()
+    assert test_client.get("/tasks", headers={"If-None-Match": etag}).status_code == 304
+    assert test_client.get("/tasks", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+
+def test_task_changes(test_client, db_session, monkeypatch):
+    """Teste la synchronisation incrémentale : créations, modifications et suppressions depuis un curseur."""
+    import app as tasks_app
+    first = test_client.post("/tasks", json={"title": "Kept"}).json()
+    second = test_client.post("/tasks", json={"title": "Changed"}).json()
+    third = test_client.post("/tasks", json={"title": "Deleted"}).json()
+    response = test_client.get("/tasks/changes")
+    assert response.status_code == 200
+    full = response.json()
+    assert full["tasks"] == [first, second, third] and full["deleted"] == []
+
+    cursor = full["cursor"]
+    assert test_client.get("/tasks/changes", params={"since": cursor}).json()["tasks"] == []
+
+    test_client.put(f"/tasks/{second['id']}", json={"title": "Changed", "completed": True})
+    test_client.delete(f"/tasks/{third['id']}")
+    fourth = test_client.post("/tasks", json={"title": "New"}).json()
+    test_client.patch("/tasks/bulk", json={"ids": [999], "changes": {"completed": True}})  # sans effet
+    test_client.post("/tasks", json={"title": "Other"})  # créée puis supprimée : seul l'ID supprimé est renvoyé
+    other_id = test_client.get("/tasks").json()[-1]["id"]
+    test_client.request("DELETE", "/tasks/bulk", json={"ids": [other_id]})
+
+    delta = test_client.get("/tasks/changes", params={"since": cursor}).json()
+    assert delta["tasks"] == [{**second, "completed": True}, fourth]
+    assert delta["deleted"] == [third["id"], other_id]
+    unchanged = test_client.get("/tasks/changes", params={"since": delta["cursor"]}).json()
+    assert unchanged["tasks"] == [] and unchanged["deleted"] == []
+
+    assert test_client.get("/tasks/changes", params={"since": "not-a-cursor"}).status_code == 400
+    monkeypatch.setattr(tasks_app, "TOMBSTONE_TTL", 0)
+    assert test_client.get("/tasks/changes", params={"since": cursor}).status_code == 410
+
+def test_task_changes_full_sync_paged(test_client):
+    """Teste que la synchronisation complète est paginée et qu'une écriture pendant le parcours est rattrapée."""
+    tasks = [test_client.post("/tasks", json={"title": f"Task {i}"}).json() for i in range(3)]
+    first = test_client.get("/tasks/changes", params={"limit": 2})
+    assert first.json() == {"tasks": tasks[:2], "deleted": [], "cursor": None}
+    after = first.headers["x-next-cursor"]
+
+    # Modifiée après la première page : absente de la suite, renvoyée par le premier delta
+    test_client.put(f"/tasks/{tasks[0]['id']}", json={"title": "Task 0", "completed": True})
+    last = test_client.get("/tasks/changes", params={"limit": 2, "after": after})
+    assert "x-next-cursor" not in last.headers
+    assert last.json()["tasks"] == tasks[2:] and last.json()["cursor"]
+    delta = test_client.get("/tasks/changes", params={"since": last.json()["cursor"]}).json()
+    assert delta["tasks"] == [{**tasks[0], "completed": True}]
+
+    assert test_client.get("/tasks/changes", params={"since": after}).status_code == 400
+    assert test_client.get("/tasks/changes", params={"after": last.json()["cursor"]}).status_code == 400
+    assert test_client.get(
+        "/tasks/changes", params={"since": last.json()["cursor"], "after": after}
+    ).status_code == 400
+
+# --- Mode asynchrone (AsyncSession) ---
+def test_crud_with_async_session():
+    """Teste les endpoints avec une AsyncSession (même chemin que DB_DRIVER=asyncpg)."""
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app import init_schema
+
+    async_engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+
+    async def create_schema():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(init_schema)
+    asyncio.run(create_schema())
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, autoflush=False)
+
+    async def override_get_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: "testuser"
+    task_cache.clear()
+    try:
+        client = TestClient(app)
+        task_id = client.post("/tasks", json={"title": "Async"}).json()["id"]
+        response = client.put(f"/tasks/{task_id}", json={"title": "Async", "completed": True})
+        assert response.json()["completed"] == True
+        assert [t["id"] for t in client.get("/tasks").json()] == [task_id]
+        assert [t["id"] for t in client.get("/tasks", params={"stream": "true"}).json()] == [task_id]
+        assert client.delete(f"/tasks/{task_id}").status_code == 204
+        assert client.get(f"/tasks/{task_id}").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+
+# --- Pool de connexions instrumenté ---
+def test_pool_stats():
+    """Teste les statistiques du pool : connexions en cours, attente et timeouts."""
+    from sqlalchemy import exc
+    from db_pool import pool_stats, InstrumentedQueuePool
+    pool_stats.reset()
+    pooled_engine = create_engine(
+        "sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01
+    )
+    conn = pooled_engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        pooled_engine.connect()
+    stats = pool_stats.snapshot(pooled_engine.pool)
+    conn.close()
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_buckets"][-1] == {"le": "+Inf", "count": 1}
+
+def test_pool_stats_endpoint(test_client):
+    """Teste l'exposition des statistiques du pool."""
+    response = test_client.get("/pool-stats")
+    assert response.status_code == 200
+    assert "checkouts" in response.json()
+
+# --- Métriques Prometheus ---
+def test_metrics_use_route_template(test_client):
+    """Teste que les métriques sont étiquetées par gabarit de route, pas par chemin brut."""
+    test_client.get("/tasks/4242")
+    test_client.get("/does-not-exist")
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="404"}' in body
+    assert 'route="<unmatched>"' in body
+    assert "/tasks/4242" not in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert "db_pool_checked_out 0" in body
+
+# --- Instrumentation SQL par requête ---
+def test_server_timing_counts_queries(test_client):
+    """Teste l'en-tête Server-Timing et les métriques SQL par requête."""
+    from sql_timing import instrument_engine
+    instrument_engine(engine)
+    response = test_client.post("/tasks", json={"title": "Timed"})
+    assert response.status_code == 201
+    server_timing = response.headers["server-timing"]
+    assert server_timing.startswith("db;dur=")
+    assert 'desc="2 queries"' in server_timing
+    assert 'db_queries_per_request_count{route="/tasks"}' in test_client.get("/metrics").text
+
+def test_slow_query_log(test_client, caplog, monkeypatch):
+    """Teste que les requêtes lentes sont journalisées avec la forme des paramètres."""
+    import sql_timing
+    sql_timing.instrument_engine(engine)
+    monkeypatch.setattr(sql_timing, "SLOW_QUERY_MS", 0)
+    with caplog.at_level("WARNING", logger="sql.slow"):
+        test_client.post("/tasks", json={"title": "secret title"})
+    assert "slow query" in caplog.text
+    assert "INSERT INTO tasks" in caplog.text
+    assert "params: ['str', " in caplog.text
+    assert "secret title" not in caplog.text
+
+def test_failed_query_recorded_without_leak(caplog):
+    """Teste qu'une requête en échec est comptée, journalisée, et ne laisse rien sur la connexion."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+    import sql_timing
+    failing_engine = sql_timing.instrument_engine(create_engine("sqlite://"))
+    errors = sql_timing.QUERY_ERRORS.labels("SELECT")
+    before = errors.get()
+    with failing_engine.connect() as conn, caplog.at_level("WARNING", logger="sql.slow"):
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert "query_start" not in conn.connection.info
+    assert errors.get() == before + 3
+    assert caplog.text.count("failed query") == 3
+    assert "missing_table" in caplog.text
+
+# --- Cache de la liste des tâches ---
+def test_read_tasks_cached_until_write(test_client, db_session):
+    """Teste que la liste est servie depuis le cache, puis invalidée par une écriture."""
+    from app import Task
+    db_session.add(Task(title="Cached", owner="testuser", completed=False))
+    db_session.commit()
+
+    first = test_client.get("/tasks")
+    assert first.headers["X-Cache"] == "MISS"
+    second = test_client.get("/tasks")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.content == first.content
+
+    test_client.post("/tasks", json={"title": "New"})
+    third = test_client.get("/tasks")
+    assert third.headers["X-Cache"] == "MISS"
+    assert [t["title"] for t in third.json()] == ["Cached", "New"]
+
+def test_task_cache_memory_cap():
+    """Teste l'éviction LRU quand le plafond mémoire est atteint."""
+    from task_cache import TaskListCache, ENTRY_OVERHEAD_BYTES
+    cache = TaskListCache(max_bytes=2 * (100 + ENTRY_OVERHEAD_BYTES), ttl=60)
+    for owner in ("a", "b", "c"):
+        cache.put(owner, None, owner, 100, cache.generation(owner))
+    assert cache.get("a", None) is None
+    assert cache.get("b", None) == "b"
+    assert cache.get("c", None) == "c"
+
+def test_task_cache_rejects_stale_put():
+    """Teste qu'une lecture antérieure à une écriture n'est pas remise en cache."""
+    from task_cache import TaskListCache
+    cache = TaskListCache(max_bytes=10_000, ttl=60)
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    cache.put("a", None, "stale", 10, generation)
+    assert cache.get("a", None) is None
+
+def test_invalidation_listener_dispatch():
+    """Teste qu'une notification d'un autre réplica invalide le cache local."""
+    from types import SimpleNamespace
+    from task_cache import TaskListCache, InvalidationListener
+    cache = TaskListCache(max_bytes=10_000, ttl=60)
+    cache.put("alice", None, "page", 10, cache.generation("alice"))
+    cache.put("bob", None, "page", 10, cache.generation("bob"))
+    conn = SimpleNamespace(notifies=[SimpleNamespace(payload="alice")])
+    InvalidationListener(cache, dsn="").dispatch(conn)
+    assert conn.notifies == []
+    assert cache.get("alice", None) is None
+    assert cache.get("bob", None) == "page"
+
+def test_task_cache_suspended_while_listener_down():
+    """Teste que le cache est contourné tant que la connexion LISTEN est coupée."""
+    from task_cache import TaskListCache
+    cache = TaskListCache(max_bytes=10_000, ttl=60)
+    cache.suspend()
+    cache.put("alice", None, "page", 10, cache.generation("alice"))
+    assert cache.get("alice", None) is None
+    cache.resume()
+    cache.put("alice", None, "page", 10, cache.generation("alice"))
+    assert cache.get("alice", None) == "page"
+
+# --- Cache des jetons vérifiés ---
+def test_get_current_user_caches_verified_token(monkeypatch):
+    """Teste qu'un jeton valide n'est décodé qu'une fois tant qu'il n'a pas expiré."""
+    import asyncio
+    from datetime import datetime, timedelta
+    import app as tasks_app
+    from token_cache import token_cache
+    token_cache.clear()
+    token = jwt.encode(
+        {"sub": "alice", "exp": datetime.utcnow() + timedelta(minutes=5)},
+        tasks_app.SECRET_KEY, algorithm=tasks_app.ALGORITHM,
+    )
+    decode_calls = []
+    real_decode = tasks_app.token_backend.decode
+    monkeypatch.setattr(tasks_app.token_backend, "decode", lambda *a, **kw: decode_calls.append(1) or real_decode(*a, **kw))
+
+    assert asyncio.run(get_current_user(token)) == "alice"
+    assert asyncio.run(get_current_user(token)) == "alice"
+    assert len(decode_calls) == 1
+
+def test_get_current_user_rejects_invalid_token():
+    """Teste qu'un jeton invalide est refusé (et jamais mis en cache)."""
+    import asyncio
+    from fastapi import HTTPException
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(get_current_user("not-a-jwt"))
+    assert excinfo.value.status_code == 401
+
+def test_token_cache_honors_exp():
+    """Teste qu'une entrée expirée n'est plus servie."""
+    import time
+    from token_cache import TokenCache
+    cache = TokenCache(max_entries=10)
+    cache.put(b"expired", {"sub": "alice", "exp": time.time() - 1})
+    cache.put(b"valid", {"sub": "bob", "exp": time.time() + 60})
+    assert cache.get(b"expired") is None
+    assert cache.get(b"valid")["sub"] == "bob"
+
+# --- Backends JWT interchangeables ---
+@pytest.mark.parametrize("issuer", ["jose", "pyjwt"])
+@pytest.mark.parametrize("verifier", ["jose", "pyjwt"])
+def test_token_backends_interoperate(issuer, verifier):
+    """Teste qu'un jeton émis par un backend est accepté, à l'identique, par l'autre."""
+    import time
+    from tokens import TokenError, get_backend
+    claims = {"sub": "alice", "exp": int(time.time()) + 60}
+    token = get_backend(issuer).encode(claims, "s" * 32, "HS256")
+    assert get_backend(verifier).decode(token, "s" * 32, ["HS256"]) == claims
+    with pytest.raises(TokenError):
+        get_backend(verifier).decode(token, "t" * 32, ["HS256"])
+
+# --- Vérification par clé publique (JWKS) ---
+def _es256_key_and_jwk(kid):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from jwt.algorithms import ECAlgorithm
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    jwk = ECAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    return pem, {**jwk, "kid": kid, "alg": "ES256", "use": "sig"}
+
+def test_get_current_user_verifies_with_jwks(monkeypatch):
+    """Teste qu'un jeton ES256 est vérifié avec la clé publique désignée par son kid, et qu'un jeton HS256 est refusé."""
+    import asyncio
+    import time
+    from fastapi import HTTPException
+    import app as tasks_app
+    from jwks import JWKSCache
+    from token_cache import token_cache
+    token_cache.clear()
+    pem, jwk = _es256_key_and_jwk("k1")
+    cache = JWKSCache("http://auth-api/.well-known/jwks.json", tasks_app.token_backend)
+    cache.load({"keys": [jwk]})
+    monkeypatch.setattr(tasks_app, "jwks_cache", cache)
+
+    token = tasks_app.token_backend.encode(
+        {"sub": "alice", "exp": int(time.time()) + 60}, pem, "ES256", headers={"kid": "k1"}
+    )
+    assert asyncio.run(get_current_user(token)) == "alice"
+
+    hs256 = jwt.encode({"sub": "alice", "exp": int(time.time()) + 60}, tasks_app.SECRET_KEY, algorithm="HS256")
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(get_current_user(hs256))
+    assert excinfo.value.status_code == 401
+
+def test_jwks_unknown_kid_refetch_is_rate_limited(monkeypatch):
+    """Teste qu'un kid inconnu déclenche une relecture du JWKS (rotation), au plus une par intervalle."""
+    import asyncio
+    import httpx
+    import time
+    from tokens import TokenError, get_backend
+    from jwks import JWKSCache
+    old_pem, old_jwk = _es256_key_and_jwk("old")
+    new_pem, new_jwk = _es256_key_and_jwk("new")
+    backend = get_backend("pyjwt")
+    cache = JWKSCache("http://auth-api/.well-known/jwks.json", backend, ttl=300, min_refresh=0)
+    cache.load({"keys": [old_jwk]})
+    fetches = []
+
+    def fake_get(url, timeout):
+        fetches.append(url)
+        return httpx.Response(200, json={"keys": [old_jwk, new_jwk]}, request=httpx.Request("GET", url))
+    monkeypatch.setattr(httpx, "get", fake_get)
+
+    token = backend.encode({"sub": "alice", "exp": int(time.time()) + 60}, new_pem, "ES256", headers={"kid": "new"})
+    algorithm, key = asyncio.run(cache.resolve(token))
+    assert backend.decode(token, key, [algorithm])["sub"] == "alice"
+    assert len(fetches) == 1
+
+    # Kid forgé : une relecture au plus par min_refresh, puis refus sans appel réseau
+    cache.min_refresh = 60
+    forged = backend.encode({"sub": "alice"}, new_pem, "ES256", headers={"kid": "forged"})
+    with pytest.raises(TokenError):
+        asyncio.run(cache.resolve(forged))
+    assert len(fetches) == 1
+
+# --- Révocation des jetons ---
+def test_bloom_filter_has_no_false_negatives():
+    """Teste le filtre de Bloom : aucun faux négatif, faux positifs proches du taux visé."""
+    from revocation import BloomFilter
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_get_current_user_rejects_revoked_token_on_cache_hit():
+    """Teste qu'un jeton révoqué (jti) est refusé même s'il est déjà dans le cache des jetons vérifiés."""
+    import asyncio
+    import time
+    from fastapi import HTTPException
+    import app as tasks_app
+    from revocation import revocations
+    from token_cache import token_cache
+    token_cache.clear()
+    revocations.clear()
+    token = jwt.encode(
+        {"sub": "alice", "exp": int(time.time()) + 60, "iat": int(time.time()), "jti": "j1"},
+        tasks_app.SECRET_KEY, algorithm=tasks_app.ALGORITHM,
+    )
+    assert asyncio.run(get_current_user(token)) == "alice"
+
+    revocations.apply([{"jti": "j1", "sub": "alice", "not_before": None, "exp": int(time.time()) + 60}], cursor=1)
+    try:
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(get_current_user(token))
+        assert excinfo.value.status_code == 401
+    finally:
+        revocations.clear()
+
+def test_revocation_user_cutoff():
+    """Teste la coupure par utilisateur : jetons émis avant refusés, jetons plus récents acceptés."""
+    from revocation import RevocationList
+    revocations = RevocationList(capacity=10)
+    revocations.apply([{"jti": None, "sub": "bob", "not_before": 1000, "exp": 9999999999}], cursor=1)
+    assert revocations.is_revoked({"sub": "bob", "iat": 999, "jti": "a"})
+    assert not revocations.is_revoked({"sub": "bob", "iat": 1001, "jti": "b"})
+    assert not revocations.is_revoked({"sub": "bob", "iat": 1000, "jti": "d"})
+    assert revocations.is_revoked({"sub": "bob", "iat": 999.999, "jti": "e"})
+    assert not revocations.is_revoked({"sub": "alice", "iat": 999, "jti": "c"})
+
+def test_revocation_sync_incremental_and_full(monkeypatch):
+    """Teste la lecture paginée du flux, la reprise au curseur et la reconstruction complète."""
+    import httpx
+    from revocation import RevocationList, RevocationSync
+    feed = [{"id": i, "jti": f"j{i}", "sub": "alice", "not_before": None, "exp": 9999999999} for i in range(1, 6)]
+    requested = []
+
+    def fake_get(url, params, headers, timeout):
+        requested.append(params["since"])
+        rows = [row for row in feed if row["id"] > params["since"]][:2]
+        body = {"revocations": rows, "cursor": rows[-1]["id"] if rows else params["since"], "more": len(rows) == 2}
+        return httpx.Response(200, json=body, request=httpx.Request("GET", url))
+    monkeypatch.setattr(httpx, "get", fake_get)
+
+    revocations = RevocationList(capacity=2)
+    sync = RevocationSync(revocations, "http://auth-api/revocations", feed_key=None)
+    sync.sync(full=True)
+    assert revocations.cursor == 5 and all(revocations.is_revoked({"jti": f"j{i}"}) for i in range(1, 6))
+
+    feed.append({"id": 6, "jti": "j6", "sub": "alice", "not_before": None, "exp": 9999999999})
+    requested.clear()
+    sync.sync()
+    assert requested[0] == 5 and revocations.is_revoked({"jti": "j6"})
+
+    # Relecture complète : les révocations expirées (absentes du flux) disparaissent
+    del feed[:5]
+    sync.sync(full=True)
+    assert not revocations.is_revoked({"jti": "j1"}) and revocations.is_revoked({"jti": "j6"})
+
+# --- Clés d'API ---
+def test_api_key_authenticates_via_cache(test_client, db_session, monkeypatch):
+    """Teste qu'une clé d'API active authentifie, est ensuite servie par le LRU, et qu'une clé révoquée est refusée."""
+    import api_keys
+    from api_keys import api_key_cache, api_key_digest
+    api_keys.api_keys.create(bind=engine, checkfirst=True)
+    api_key_cache.clear()
+    app.dependency_overrides.pop(get_current_user)
+    active, revoked, unknown = ("tk_" + c * 43 for c in "abc")
+    db_session.execute(api_keys.api_keys.insert().values([
+        {"key_hash": api_key_digest(active), "username": "robot", "revoked_at": None},
+        {"key_hash": api_key_digest(revoked), "username": "robot", "revoked_at": 1},
+    ]))
+    lookups = []
+    real_lookup = api_keys.lookup_api_key
+    monkeypatch.setattr("app.lookup_api_key", lambda db, digest: lookups.append(digest) or real_lookup(db, digest))
+
+    for _ in range(2):
+        response = test_client.get("/tasks", headers={"Authorization": f"Bearer {active}"})
+        assert response.status_code == 200
+    assert len(lookups) == 1
+
+    for key in (revoked, unknown):
+        response = test_client.get("/tasks", headers={"Authorization": f"Bearer {key}"})
+        assert response.status_code == 401
+    # Forme invalide (longueur, alphabet) : refusée sans aller en base
+    for key in ("tk_unknown", "tk_" + "a" * 44, "tk_" + "!" * 43):
+        response = test_client.get("/tasks", headers={"Authorization": f"Bearer {key}"})
+        assert response.status_code == 401
+    assert len(lookups) == 3
+    api_key_cache.clear()
+
+def test_api_key_cache_negative_entries_separate():
+    """Teste qu'un flot de clés inconnues n'évince pas les clés valides du cache."""
+    from api_keys import ApiKeyCache
+    cache = ApiKeyCache(max_entries=2, ttl=60, max_negative=2)
+    cache.put("valid", "robot")
+    for i in range(10):
+        cache.put(f"unknown{i}", None)
+    assert cache.get("valid") == (True, "robot")
+    assert cache.get("unknown9") == (True, None)
+    assert cache.get("unknown0") == (False, None)
@@ -0,0 +1,73 @@
+"""
+Cache des jetons JWT déjà vérifiés.
+
+Un même jeton est présenté à chaque requête pendant toute sa durée de vie : on garde
+le résultat de la vérification (sujet + revendications) sous la clé SHA-256 du jeton,
+jusqu'à son `exp`. Le cache est un LRU borné (TOKEN_CACHE_SIZE entrées, défaut 10 000,
+0 = désactivé). Une révocation ne retire pas l'entrée : les revendications sont
+conservées et get_current_user les passe à revocations.is_revoked (revocation.py) à
+chaque requête, hit compris, si bien qu'un jeton révoqué est refusé dès la
+synchronisation suivante même s'il est en cache.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+HITS = Counter("token_cache_hits_total", "Verified-token cache hits.")
+MISSES = Counter("token_cache_misses_total", "Verified-token cache misses.")
+HIT_RATIO = Gauge("token_cache_hit_ratio", "Verified-token cache hit ratio since start.")
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> (exp, claims)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        HIT_RATIO.set_function(self.hit_ratio)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, digest: bytes):
+        """Revendications du jeton s'il a déjà été vérifié et n'a pas expiré, sinon None."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[digest]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                MISSES.inc()
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        HITS.inc()
+        return entry[1]
+
+    def put(self, digest: bytes, claims: dict):
+        exp = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[digest] = (exp, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(max_entries=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))